@@ -1,103 +1,355 @@
 ﻿import gradio as gr
 import asyncio
+import os
 import sys
 import io
-from contextlib import redirect_stdout, redirect_stderr
+import contextvars
+from contextlib import contextmanager
 from mcp_use import MCPAgent, MCPClient
 from langchain_openai import AzureChatOpenAI
-from InstantDBScriptMaker import launch_db_script_maker
+from InstantDBScriptMaker import launch_db_script_maker, load_env_config
+from WorkItemIndex import answer_from_index
+from BulkWorkItemUpdater import parse_bulk_command, iter_bulk_update, close_bulk_update
+from ToolArgumentValidator import install_argument_validation
+from AgentBudget import classify_query, get_budget, BudgetTracker, install_tool_budget, run_with_budget
+from AgentRunControl import run_key, register_run, finish_run, cancel_session_run, record_cancelled_work
+from ParallelToolDispatch import PooledConnector, is_read_only_tool, agent_client_for
+from AdoMetadataCache import install_metadata_tool_cache
+from TrafficRecorder import get_traffic_mode, TrafficLog, TrafficLLMCache, ReplayConnector, install_traffic_recorder
+from SingleFlight import install_tool_single_flight
+from ToolResultShaper import install_result_shaper, shaping_stats
+from ModelRouter import get_model_router, build_routed_llm
+from PromptPrefix import stabilize_tool_prefix, PromptCacheMetrics
+from ServiceHookReceiver import start_service_hook_receiver
+from OrgRegistry import get_org_registry
+from AgentWorkerPool import get_execution_mode, get_agent_worker_pool
 import threading
+from collections import deque
 
-# Azure OpenAI Configuration
+# Steer the agent to one batch call instead of N sequential update calls, and to
+# request independent reads together so they can be dispatched in parallel
+AGENT_INSTRUCTIONS = (
+    "When the same field change or comment applies to several work items, make a single "
+    "wit_update_work_items_batch call covering all of them instead of one call per work item. "
+    "When you need several independent pieces of information, request all of those tool calls "
+    "in the same step instead of one after another."
+)
 
+# Azure OpenAI Configuration (environment or .env); ADOBUDDY_DEPLOYMENTS may list several deployments
+def _setting(name, default=None):
+    return os.environ.get(name) or load_env_config().get(name, default)
 
-async def process_query(user_message):
-    """Show all steps and stream logs from MCP tool execution."""
+endpoint = _setting("AZURE_OPENAI_ENDPOINT")
+subscription_key = _setting("AZURE_OPENAI_API_KEY")
+api_version = _setting("AZURE_OPENAI_API_VERSION", "2025-01-01-preview")
+deployment = _setting("AZURE_OPENAI_DEPLOYMENT")
+
+def get_mcp_config(organization=None):
+    """MCP Configuration for Azure DevOps (the default organization unless one is given)"""
+    return (organization or get_org_registry().default).mcp_config()
+
+# Verbose tool output is cut in the streamed log; the agent only sees shaped results anyway
+MAX_LOG_LINE_CHARS = 500
+
+# Captured agent output per query is capped; verbose runs keep only the latest part
+MAX_CAPTURED_LOG_CHARS = 200000
+
+class BoundedLogBuffer(io.TextIOBase):
+    """stdout/stderr capture that keeps at most max_chars, dropping the oldest output"""
+
+    def __init__(self, max_chars=MAX_CAPTURED_LOG_CHARS):
+        self.max_chars = max_chars
+        self.dropped = 0
+        self._chunks = deque()
+        self._size = 0
+
+    def writable(self):
+        return True
+
+    def write(self, text):
+        written = len(text)
+        if written > self.max_chars:
+            self.dropped += written - self.max_chars
+            text = text[-self.max_chars:]
+        self._chunks.append(text)
+        self._size += len(text)
+        while self._size > self.max_chars:
+            oldest = self._chunks.popleft()
+            self._size -= len(oldest)
+            self.dropped += len(oldest)
+        return written
+
+    def getvalue(self):
+        dropped = f"[{self.dropped} earlier log chars dropped]\n" if self.dropped else ""
+        return dropped + "".join(self._chunks)
+
+# Output captured per asyncio task. redirect_stdout swaps the process-wide sys.stdout, so
+# two overlapping queries restore each other's buffers and the process output ends up in
+# a finished query's buffer; these streams pick the buffer from the running task instead.
+_captured_output = contextvars.ContextVar("captured_output", default=None)
+
+class _TaskLocalStream(io.TextIOBase):
+    """sys.stdout/sys.stderr stand-in writing to the current task's capture buffer, if any"""
+
+    def __init__(self, original, index):
+        self.original = original
+        self.index = index
+
+    def writable(self):
+        return True
+
+    def write(self, text):
+        buffers = _captured_output.get()
+        return (buffers[self.index] if buffers else self.original).write(text)
+
+    def flush(self):
+        if _captured_output.get() is None:
+            self.original.flush()
+
+    def fileno(self):
+        return self.original.fileno()
+
+    def isatty(self):
+        return self.original.isatty()
+
+    @property
+    def encoding(self):
+        return self.original.encoding
+
+@contextmanager
+def capture_output(out, err):
+    """Send this task's (and its child tasks') stdout/stderr to out/err"""
+    if not isinstance(sys.stdout, _TaskLocalStream):
+        sys.stdout = _TaskLocalStream(sys.stdout, 0)
+    if not isinstance(sys.stderr, _TaskLocalStream):
+        sys.stderr = _TaskLocalStream(sys.stderr, 1)
+    token = _captured_output.set((out, err))
     try:
+        yield
+    finally:
+        _captured_output.reset(token)
+
+# Replay runs at full speed, without the cosmetic streaming delays
+FULL_SPEED_REPLAY = get_traffic_mode() == "replay"
+
+async def _ui_pause(seconds):
+    """Cosmetic streaming delay between chunks"""
+    if not FULL_SPEED_REPLAY:
+        await asyncio.sleep(seconds)
+
+async def process_query(user_message, session_pool=None, http_async_client=None, organization=None,
+                        raise_errors=False):
+    """Show all steps and stream logs from MCP tool execution.
+
+    session_pool and http_async_client let callers running many queries (the batch runner)
+    share warm MCP sessions and the LLM connection pool instead of starting fresh ones.
+    organization defaults to the one owning the project the query mentions.
+    raise_errors raises failures instead of streaming them as an "Error: ..." line.
+    """
+    client = None
+    tracker = None
+    try:
+        registry = get_org_registry()
+        organization = organization or registry.resolve(user_message)
+        if len(registry.organizations) > 1:
+            yield f"[Organization: {organization.name}]\n"
+
+        # Explicit bulk commands skip the agent and run through the $batch endpoint
+        bulk_command = parse_bulk_command(user_message) if isinstance(user_message, str) else None
+        if bulk_command:
+            yield f"[Bulk update{' (dry run)' if bulk_command['dry_run'] else ''}]\n"
+            bulk_organization = registry.for_project(bulk_command["project"])
+            cancel_event = threading.Event()
+            updates = iter_bulk_update(**bulk_command, organization_url=bulk_organization.url, cancel_event=cancel_event)
+            finished = False
+            try:
+                while True:
+                    line = await asyncio.to_thread(next, updates, None)
+                    if line is None:
+                        break
+                    yield line
+                finished = True
+            finally:
+                if not finished:
+                    # Cancelled: stop unsent batches now and run the generator's cleanup once its thread is free
+                    cancel_event.set()
+                    close_bulk_update(updates)
+            return
+
+        # Simple "my work items" questions are served from the local index in milliseconds
+        if isinstance(user_message, str):
+            indexed_answer = answer_from_index(user_message)
+            if indexed_answer:
+                yield "[Answered from local work-item index]\n"
+                yield indexed_answer
+                return
+
         # Step 1: Checking tools with npx
         yield "[Step 1/4] Checking tools with npx...\n"
-        await asyncio.sleep(0.2)
+        await _ui_pause(0.2)
 
         # MCP Configuration for Azure DevOps
-        config = {
-            "mcpServers": {
-                "ado": {
-                    "command": "npx",
-                    "args": ["-y", "@azure-devops/mcp", "tr-tax"]
-                }
-            }
-        }
+        config = get_mcp_config(organization)
 
         # Step 2: Creating MCPClient
         yield "[Step 2/4] Creating MCPClient...\n"
-        await asyncio.sleep(0.2)
-        client = MCPClient.from_dict(config)
+        await _ui_pause(0.2)
+        traffic_mode = get_traffic_mode()
+        traffic_log = TrafficLog(mode=traffic_mode) if traffic_mode != "off" else None
+        if traffic_mode == "replay":
+            # Recorded tool list and results stand in for the ADO MCP server
+            connector = ReplayConnector(traffic_log)
+            await connector.connect()
+            await connector.initialize()
+        elif session_pool is not None:
+            # Shared warm sessions: each run wraps its own connector view of the pool
+            connector = PooledConnector(session_pool)
+            if traffic_mode == "record":
+                install_traffic_recorder(connector, traffic_log)
+        else:
+            # No shared pool (e.g. a one-off caller): a single session, without the extra
+            # per-query MCP processes that parallel dispatch would start and tear down
+            client = MCPClient.from_dict(config)
+            session = await client.create_session("ado")
+            connector = session.connector
+            if traffic_mode == "record":
+                install_traffic_recorder(connector, traffic_log)
+        # Projects, teams, iterations and work item types are reused across queries
+        install_metadata_tool_cache(connector, organization.name)
+        # Identical read-only calls from concurrent sessions share one in-flight request
+        install_tool_single_flight(connector, is_read_only_tool, organization.name)
+        # Validate and repair tool arguments locally before they reach the MCP server
+        validation_stats = install_argument_validation(connector)
+
+        # Wall time, token and tool call limits depend on what kind of query this is
+        query_class = classify_query(user_message)
+        budget = get_budget(query_class)
+        tracker = BudgetTracker(user_message, query_class, budget)
+        install_tool_budget(connector, tracker)
+        # Large list results are trimmed and paged before they reach the LLM
+        shaped_before = dict(shaping_stats)
+        install_result_shaper(connector, user_message, is_read_only_tool, organization.name)
+        # Sorted, canonical tool schemas keep the prompt prefix byte-stable for prompt caching
+        prefix_hash = stabilize_tool_prefix(connector, AGENT_INSTRUCTIONS)
+        prompt_metrics = PromptCacheMetrics()
 
         # Step 3: Getting user query and executing tools
         yield "[Step 3/4] Executing tools for your query...\n"
-        await asyncio.sleep(0.2)
-        llm = AzureChatOpenAI(
-            api_version=api_version,
-            azure_endpoint=endpoint,
-            api_key=subscription_key,
-            azure_deployment=deployment,
-            temperature=1.0,
-            max_tokens=800
-        )
-        agent = MCPAgent(llm=llm, client=client, max_steps=30)
-
-        # Patch: Ensure proper structure for work item creation
-        patched_message = user_message
-        if isinstance(user_message, dict):
-            # If it looks like a work item creation request but missing fields
-            if ("project" in user_message or "workItemType" in user_message) and "fields" not in user_message:
-                patched_message = dict(user_message)  # shallow copy
-                # If fields is missing, initialize it as empty dict
-                if "fields" not in patched_message:
-                    patched_message["fields"] = {}
-            
-            # For work item creation, also ensure we have the required structure
-            if "project" in user_message and "workItemType" in user_message:
-                # The MCP server might expect this structure for wit_create_work_item
-                if not patched_message.get("fields"):
-                    patched_message["fields"] = {}
-                
-                # Add any additional fields that might be at the root level to fields
-                for key, value in list(patched_message.items()):
-                    if key not in ["project", "workItemType", "fields"] and not key.startswith("System."):
-                        # Move custom fields to the fields object
-                        patched_message["fields"][key] = value
-                        del patched_message[key]
+        await _ui_pause(0.2)
+        # Lookups go to the fast deployment, analysis to the large one, adjusted for measured
+        # latency and throttling; the other deployments are fallbacks. Recorded traffic is
+        # keyed by deployment, so record/replay always use the configured order.
+        router = get_model_router(deployment)
+        deployment_order = router.route(query_class, adaptive=traffic_mode == "off")
+        routing_before = router.stats()
+
+        def make_llm(deployment_name, routing_callback, max_retries):
+            return AzureChatOpenAI(
+                api_version=api_version,
+                azure_endpoint=endpoint,
+                api_key=subscription_key,
+                azure_deployment=deployment_name,
+                temperature=1.0,
+                max_tokens=budget["max_tokens"],
+                max_retries=max_retries,
+                callbacks=[tracker, routing_callback, prompt_metrics],
+                # Recording and replay go through the LLM cache, which streaming would bypass
+                cache=TrafficLLMCache(traffic_log) if traffic_log else None,
+                disable_streaming=traffic_log is not None,
+                http_async_client=http_async_client
+            )
+        llm = build_routed_llm(router, deployment_order, make_llm)
+        agent = MCPAgent(llm=llm, client=client or agent_client_for(connector), max_steps=budget["max_steps"],
+                         additional_instructions=AGENT_INSTRUCTIONS)
 
         # Capture stdout/stderr during agent.run
-        f = io.StringIO()
-        e = io.StringIO()
+        f = BoundedLogBuffer()
+        e = BoundedLogBuffer()
         result = None
+        hit_limit = False
         try:
-            with redirect_stdout(f), redirect_stderr(e):
-                result = await agent.run(patched_message, max_steps=30)
+            with capture_output(f, e):
+                result, hit_limit = await run_with_budget(agent, user_message, tracker)
         except Exception as ex:
+            if raise_errors:
+                raise
             yield f"[Error during tool execution: {ex}]\n"
         # Stream captured logs
         logs = f.getvalue() + e.getvalue()
         if logs:
             for line in logs.splitlines():
+                if len(line) > MAX_LOG_LINE_CHARS:
+                    line = f"{line[:MAX_LOG_LINE_CHARS]}... ({len(line) - MAX_LOG_LINE_CHARS} more chars)"
                 yield f"[log] {line}\n"
-                await asyncio.sleep(0.01)
+                await _ui_pause(0.01)
+
+        usage = tracker.usage()
+        yield (f"[budget] {query_class}{' (limit hit)' if hit_limit else ''}: {usage['elapsed_seconds']}s, "
+               f"{usage['llm_tokens']} tokens, {usage['tool_calls']} tool call(s)\n")
+        routing = router.stats()
+        used = [f"{name} ({routing[name]['latency_ewma']}s avg)" for name in deployment_order
+                if routing[name]["calls"] > routing_before[name]["calls"]]
+        yield f"[routing] {query_class} -> {', '.join(used) or deployment_order[0]}\n"
+        prompt_cache = prompt_metrics.summary()
+        if prompt_cache["llm_calls"]:
+            yield (f"[prompt cache] prefix {prefix_hash}: {prompt_cache['cached_tokens']}/{prompt_cache['prompt_tokens']} "
+                   f"prompt tokens cached ({prompt_cache['cached_ratio']:.0%}), "
+                   f"TTFT {prompt_cache['first_ttft_seconds']}s first / {prompt_cache['avg_ttft_seconds']}s avg\n")
+        if traffic_mode == "replay":
+            yield f"[traffic] replay: {traffic_log.hits} response(s) replayed, {traffic_log.misses} missed ({traffic_log.path})\n"
+        elif traffic_mode == "record":
+            yield f"[traffic] recorded to {traffic_log.path}\n"
+        shaped_count = shaping_stats["shaped"] - shaped_before["shaped"]
+        if shaped_count:
+            chars_in = shaping_stats["chars_in"] - shaped_before["chars_in"]
+            chars_out = shaping_stats["chars_out"] - shaped_before["chars_out"]
+            yield f"[shaping] {shaped_count} large tool result(s) trimmed from {chars_in} to {chars_out} chars\n"
+        if validation_stats["auto_fixed"] or validation_stats["rejected"]:
+            yield (f"[validation] {validation_stats['auto_fixed']} tool call(s) auto-fixed, "
+                   f"{validation_stats['rejected']} rejected locally, "
+                   f"{validation_stats['retries_saved']} agent retries saved\n")
 
         # Step 4: Returning output
         yield "[Step 4/4] Returning output...\n"
-        await asyncio.sleep(0.2)
+        await _ui_pause(0.2)
         if result is not None:
             for char in str(result):
                 yield char
-                await asyncio.sleep(0.01)
+                await _ui_pause(0.01)
         else:
             yield "[No output returned from tool.]\n"
+    except asyncio.CancelledError:
+        # Cleared or resubmitted by the user: account the abandoned work and stop immediately
+        record_cancelled_work(tracker)
+        raise
     except Exception as e:
+        if raise_errors:
+            raise
         yield f"Error: {str(e)}\n"
+    finally:
+        if client is not None:
+            # Terminates the MCP Node subprocess started for this query
+            try:
+                await client.close_all_sessions()
+            except Exception as ex:
+                print(f"Error closing MCP sessions: {ex}")
+
+def get_mcp_session_mode():
+    """Return per-query (the default) or shared from the environment or .env"""
+    mode = (_setting("ADOBUDDY_MCP_SESSIONS", "per-query") or "per-query").strip().lower()
+    return mode if mode == "shared" else "per-query"
 
-async def chatbot_response(message, history):
+async def get_shared_session_pool(organization):
+    """Warm MCP sessions of an organization, shared by every chat session and started on first use.
+
+    Only with ADOBUDDY_MCP_SESSIONS=shared; by default (None) each query starts and reaps its
+    own MCP Node process through MCPClient.
+    """
+    if get_traffic_mode() == "replay" or get_mcp_session_mode() != "shared":
+        return None
+    return await organization.get_session_pool()
+
+async def chatbot_response(message, history, request: gr.Request = None):
     """Gradio chatbot response function that handles streaming."""
     if not message.strip():
         history.append([message, "Please enter a message."])
@@ -105,22 +357,53 @@ async def chatbot_response(message, history):
         return
 
     history.append([message, ""])
-    
+
+    # A new submission from the same browser session cancels the run it replaces
+    session_key = run_key(request.session_hash if request is not None else None)
+    task = register_run(session_key)
+    cancelled = False
     try:
-        async for chunk in process_query(message):
+        organization = get_org_registry().resolve(message)
+        if get_execution_mode() == "process":
+            # The turn runs in a worker process with its own warm MCP and LLM clients
+            chunks = get_agent_worker_pool().stream(message, organization.name)
+        else:
+            session_pool = await get_shared_session_pool(organization)
+            chunks = process_query(message, session_pool=session_pool, organization=organization)
+        async for chunk in chunks:
             history[-1][1] += chunk
             yield history
+    except asyncio.CancelledError:
+        cancelled = True
+        raise
     except Exception as e:
         error_response = f"Error: {str(e)}"
         history[-1][1] = error_response
         yield history
+    finally:
+        finish_run(session_key, task, cancelled)
+
+def clear_chat(request: gr.Request = None):
+    """Clear the chat and cancel the session's in-flight agent run"""
+    if request is not None:
+        cancel_session_run(request.session_hash)
+    return []
+
+_db_script_maker_thread = None
+_db_script_maker_lock = threading.Lock()
 
 def tool1():
     """Launch Instant DB Script Maker in a new tab"""
+    global _db_script_maker_thread
     try:
-        # Launch in a separate thread to avoid blocking the main interface
-        thread = threading.Thread(target=launch_db_script_maker, daemon=True)
-        thread.start()
+        with _db_script_maker_lock:
+            # One server for the lifetime of the app; further clicks reuse it
+            if _db_script_maker_thread is not None and _db_script_maker_thread.is_alive():
+                return "Instant DB Script Maker is already running at http://127.0.0.3:7881"
+            # Launch in a separate thread to avoid blocking the main interface
+            thread = threading.Thread(target=launch_db_script_maker, daemon=True)
+            thread.start()
+            _db_script_maker_thread = thread
         return "Instant DB Script Maker launched in a new tab!"
     except Exception as e:
         return f"Error launching DB Script Maker: {str(e)}"
@@ -186,88 +469,98 @@ css = """
 """
 
 # Create Gradio interface with custom CSS
-with gr.Blocks(title="Azure DevOps Chatbot", css=css) as demo:
-    # State to manage popup visibility
-    popup_visible = gr.State(False)
-
-    # Navbar with hamburger button on the left
-    with gr.Row(elem_id="navbar-row"):
-        with gr.Column(scale=1, min_width=70):
-            tools_hamburger_btn = gr.Button("☰", elem_id="tools-hamburger-btn")
-        with gr.Column(scale=10):
-            gr.Markdown(
-                "<h1 style='text-align: center; margin: 0; padding: 20px; background: linear-gradient(90deg, #ff8c00, #ff7f00); color: white; border-radius: 8px;'>Smart Azure DevOps Assistant</h1>",
-                elem_id="navbar"
-            )
+def build_demo():
+    """Build the Gradio UI; only the UI process calls this, not agent workers or batch runs"""
+    with gr.Blocks(title="Azure DevOps Chatbot", css=css) as demo:
+        # State to manage popup visibility
+        popup_visible = gr.State(False)
 
-    # Popup overlay (to close the popup when clicked)
-    tools_popup_overlay = gr.Button("", visible=False, elem_id="tools-popup-overlay")
-
-    # Popup window (drawer) for tools, using gr.Group instead of gr.Box
-    with gr.Group(visible=True, elem_id="tools-popup") as tools_popup:
-        gr.Label("ADO Tools Suite")
-        close_popup_btn = gr.Button("×", elem_id="close-popup-btn")
-        with gr.Column():
-            #gr.HTML("<div style='height: 20px;'></div>")# Spacer
-            tool1_button = gr.Button("Instant DB Script Maker")
-            #gr.HTML("<div style='height: 20px;'></div>")
-            #tool2_button = gr.Button("Bulk SB creator")
-
-    # Main chatbot interface
-    with gr.Row():
-        with gr.Column(scale=4):
-            gr.Label("Azure DevOps Assistant Chatbot")
-            chatbot = gr.Chatbot([], height=400)
-            with gr.Row():
-                msg = gr.Textbox(
-                    placeholder="Enter your Azure DevOps query here...",
-                    container=False,
-                    scale=4
+        # Navbar with hamburger button on the left
+        with gr.Row(elem_id="navbar-row"):
+            with gr.Column(scale=1, min_width=70):
+                tools_hamburger_btn = gr.Button("☰", elem_id="tools-hamburger-btn")
+            with gr.Column(scale=10):
+                gr.Markdown(
+                    "<h1 style='text-align: center; margin: 0; padding: 20px; background: linear-gradient(90deg, #ff8c00, #ff7f00); color: white; border-radius: 8px;'>Smart Azure DevOps Assistant</h1>",
+                    elem_id="navbar"
                 )
-                submit_btn = gr.Button("Submit", variant="primary", scale=1)
-                clear = gr.Button("Clear", scale=1)
-            gr.Markdown("<b><span style='color: red;'>Note: Chatbot functionality is limited to reading task data and updating specific fields. Task creation and deletion are restricted.</span></b>")
-            gr.Examples(
-                examples=[
-                    "List me 1 task that I am assigned to in Azure DevOps in taxprof project",
-                    "update comment as 'Unit testing completed' in task 4127687 in Taxprof project",
-                    "Give me latest information on latest successful build pipeline of Roll BlueMoon Build Numbers in taxprof project"
-                ],
-                inputs=msg
-            )
 
-    # --- Event Handlers for Popup ---
-    def toggle_popup(is_visible):
-        return gr.update(visible=not is_visible), gr.update(visible=not is_visible)
+        # Popup overlay (to close the popup when clicked)
+        tools_popup_overlay = gr.Button("", visible=False, elem_id="tools-popup-overlay")
 
-    def close_popup():
-        return gr.update(visible=False), gr.update(visible=False)
+        # Popup window (drawer) for tools, using gr.Group instead of gr.Box
+        with gr.Group(visible=True, elem_id="tools-popup") as tools_popup:
+            gr.Label("ADO Tools Suite")
+            close_popup_btn = gr.Button("×", elem_id="close-popup-btn")
+            with gr.Column():
+                #gr.HTML("<div style='height: 20px;'></div>")# Spacer
+                tool1_button = gr.Button("Instant DB Script Maker")
+                #gr.HTML("<div style='height: 20px;'></div>")
+                #tool2_button = gr.Button("Bulk SB creator")
 
-    tools_hamburger_btn.click(
-        lambda: (gr.update(elem_classes="visible"), gr.update(visible=True)),
-        outputs=[tools_popup, tools_popup_overlay]
-    )
+        # Main chatbot interface
+        with gr.Row():
+            with gr.Column(scale=4):
+                gr.Label("Azure DevOps Assistant Chatbot")
+                chatbot = gr.Chatbot([], height=400)
+                with gr.Row():
+                    msg = gr.Textbox(
+                        placeholder="Enter your Azure DevOps query here...",
+                        container=False,
+                        scale=4
+                    )
+                    submit_btn = gr.Button("Submit", variant="primary", scale=1)
+                    clear = gr.Button("Clear", scale=1)
+                gr.Markdown("<b><span style='color: red;'>Note: Chatbot functionality is limited to reading task data and updating specific fields. Task creation and deletion are restricted.</span></b>")
+                gr.Examples(
+                    examples=[
+                        "List me 1 task that I am assigned to in Azure DevOps in taxprof project",
+                        "update comment as 'Unit testing completed' in task 4127687 in Taxprof project",
+                        "bulk update TaxProf ids 4127687,4127688 set System.State=Closed comment \"Closed in bulk\" dry-run",
+                        "Give me latest information on latest successful build pipeline of Roll BlueMoon Build Numbers in taxprof project"
+                    ],
+                    inputs=msg
+                )
 
-    close_popup_btn.click(
-        lambda: (gr.update(elem_classes=""), gr.update(visible=False)),
-        outputs=[tools_popup, tools_popup_overlay]
-    )
+        # --- Event Handlers for Popup ---
+        def toggle_popup(is_visible):
+            return gr.update(visible=not is_visible), gr.update(visible=not is_visible)
 
-    tools_popup_overlay.click(
-        lambda: (gr.update(elem_classes=""), gr.update(visible=False)),
-        outputs=[tools_popup, tools_popup_overlay]
-    )
+        def close_popup():
+            return gr.update(visible=False), gr.update(visible=False)
+
+        tools_hamburger_btn.click(
+            lambda: (gr.update(elem_classes="visible"), gr.update(visible=True)),
+            outputs=[tools_popup, tools_popup_overlay]
+        )
+
+        close_popup_btn.click(
+            lambda: (gr.update(elem_classes=""), gr.update(visible=False)),
+            outputs=[tools_popup, tools_popup_overlay]
+        )
+
+        tools_popup_overlay.click(
+            lambda: (gr.update(elem_classes=""), gr.update(visible=False)),
+            outputs=[tools_popup, tools_popup_overlay]
+        )
 
-    # --- Original Event Handlers ---
-    msg.submit(chatbot_response, [msg, chatbot], [chatbot])
-    msg.submit(lambda: "", None, [msg])
-    submit_btn.click(chatbot_response, [msg, chatbot], [chatbot])
-    submit_btn.click(lambda: "", None, [msg])
-    clear.click(lambda: [], None, [chatbot])
-    tool1_button.click(tool1, outputs=msg)
+        # --- Original Event Handlers ---
+        msg_event = msg.submit(chatbot_response, [msg, chatbot], [chatbot])
+        msg.submit(lambda: "", None, [msg])
+        submit_event = submit_btn.click(chatbot_response, [msg, chatbot], [chatbot])
+        submit_btn.click(lambda: "", None, [msg])
+        clear.click(clear_chat, None, [chatbot], cancels=[msg_event, submit_event])
+        tool1_button.click(tool1, outputs=msg)
+    return demo
 
 if __name__ == "__main__":
     print("Starting Azure DevOps Chatbot...")
+    # ADO service hooks keep the local caches fresh alongside the UI
+    start_service_hook_receiver()
+    if get_execution_mode() == "process":
+        # Workers warm up their MCP sessions while the UI starts
+        get_agent_worker_pool().start()
+    demo = build_demo()
     demo.launch(
         server_name="127.0.0.3",
         server_port=7880,
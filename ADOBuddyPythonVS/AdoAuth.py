@@ -0,0 +1,58 @@
+import base64
+from SingleFlight import SingleFlight
+from InstantDBScriptMaker import load_env_config, authenticate_with_pat, authenticate_azure_cli_powershell
+
+DEFAULT_ORGANIZATION_URL = "https://dev.azure.com/tr-tax"
+DEFAULT_PROJECT = "TaxProf"
+
+# One single-flight group for every token fetch in the process, keyed by token
+# resource, so all modules asking for the same token share one in-flight fetch
+AZURE_DEVOPS_RESOURCE = "499b84ac-1321-427f-aa17-267ca6975798"
+token_flight = SingleFlight()
+
+def get_organization_url():
+    """Return the Azure DevOps organization URL from .env, falling back to tr-tax"""
+    config = load_env_config()
+    organization_url = config.get('ADO_ORGANIZATION_URL', '')
+    if not organization_url or 'your-organization' in organization_url:
+        organization_url = DEFAULT_ORGANIZATION_URL
+    return organization_url.rstrip('/')
+
+def get_ado_auth_token(organization_url=None):
+    """Get a token for REST calls, trying PAT first and Azure CLI second.
+
+    With organization_url the token comes from that organization's registry entry
+    (its own PAT variable and token cache). Returns (token, use_pat, message) so
+    callers can build the right header.
+    """
+    if organization_url:
+        from OrgRegistry import get_org_registry
+        return get_org_registry().for_url(organization_url).get_auth_token()
+
+    pat_token, pat_message = authenticate_with_pat()
+    if pat_token:
+        return pat_token, True, "Success with PAT"
+
+    cli_token, cli_message = authenticate_azure_cli_powershell()
+    if cli_token:
+        return cli_token, False, "Success with Azure CLI"
+
+    return None, False, f"PAT authentication: {pat_message}; Azure CLI authentication: {cli_message}"
+
+def get_http_session(organization_url=None):
+    """requests.Session with the connection pool of the organization a URL belongs to"""
+    from OrgRegistry import get_org_registry
+    return get_org_registry().for_url(organization_url).http
+
+def build_ado_headers(auth_token, use_pat=False, content_type="application/json"):
+    """Build request headers for either PAT (Basic) or Azure CLI (Bearer) tokens"""
+    if use_pat:
+        credentials = base64.b64encode(f":{auth_token}".encode()).decode()
+        authorization = f"Basic {credentials}"
+    else:
+        authorization = f"Bearer {auth_token}"
+
+    return {
+        "Content-Type": content_type,
+        "Authorization": authorization
+    }
@@ -0,0 +1,201 @@
+import os
+import json
+import time
+import threading
+import requests
+from collections import OrderedDict
+
+# Cache for Azure DevOps metadata that rarely changes: projects, teams, iterations,
+# area paths, work item types and field definitions. REST lookups are kept on disk
+# with long TTLs and revalidated with If-None-Match, so most reads are local or a
+# cheap 304. The chatbot's metadata MCP tools share an in-process TTL cache.
+script_dir = os.path.dirname(os.path.abspath(__file__))
+METADATA_CACHE_PATH = os.path.join(script_dir, ".adobuddy", "metadata_cache.json")
+
+HOUR = 60 * 60
+METADATA_TTLS = {
+    "projects": 24 * HOUR,
+    "teams": 24 * HOUR,
+    "iterations": 6 * HOUR,
+    "area_paths": 24 * HOUR,
+    "work_item_types": 24 * HOUR,
+    "fields": 24 * HOUR,
+}
+
+# MCP tools whose results are metadata, with how long a result may be reused
+METADATA_TOOL_TTLS = {
+    "core_list_projects": 24 * HOUR,
+    "core_list_project_teams": 24 * HOUR,
+    "work_list_team_iterations": 6 * HOUR,
+    "wit_get_work_item_type": 24 * HOUR,
+    "wit_list_backlogs": 24 * HOUR,
+}
+
+MAX_TOOL_CACHE_ENTRIES = 256
+
+cache_stats = {"local": 0, "not_modified": 0, "fetched": 0, "tool_hits": 0, "tool_misses": 0}
+
+_cache = None
+_cache_lock = threading.Lock()
+_tool_cache = OrderedDict()
+_tool_cache_lock = threading.Lock()
+
+def _read_cache_file():
+    try:
+        with open(METADATA_CACHE_PATH, 'r', encoding='utf-8') as file:
+            return json.load(file)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+def _load_cache(reload=False):
+    """In-memory cache, read from disk on first use; reload merges in newer entries from disk"""
+    global _cache
+    if _cache is None:
+        _cache = _read_cache_file()
+    elif reload:
+        # Another process (or an agent worker) may have refreshed entries since we loaded
+        for url, entry in _read_cache_file().items():
+            current = _cache.get(url)
+            if current is None or entry.get('fetched_at', 0) > current.get('fetched_at', 0):
+                _cache[url] = entry
+    return _cache
+
+def _save_cache():
+    os.makedirs(os.path.dirname(METADATA_CACHE_PATH), exist_ok=True)
+    temp_path = METADATA_CACHE_PATH + ".tmp"
+    with open(temp_path, 'w', encoding='utf-8') as file:
+        json.dump(_cache, file)
+    os.replace(temp_path, METADATA_CACHE_PATH)
+
+def get_cached_json(url, headers, kind, revalidate=True, organization_url=None):
+    """GET a metadata URL through the cache.
+
+    Fresh entries are served locally; stale ones are revalidated with their ETag, or
+    served as they are with revalidate=False. Requests go through the organization's
+    pooled session. Returns (data, message) with data None on failure.
+    """
+    # Imported here: AdoAuth imports InstantDBScriptMaker, which imports this module
+    from AdoAuth import get_http_session
+
+    ttl = METADATA_TTLS.get(kind, HOUR)
+    with _cache_lock:
+        entry = _load_cache().get(url)
+        if entry and time.time() - entry['fetched_at'] >= ttl:
+            entry = _load_cache(reload=True).get(url)
+        if entry and (time.time() - entry['fetched_at'] < ttl or not revalidate):
+            cache_stats["local"] += 1
+            return entry['data'], "Success (cache)"
+        etag = entry.get('etag') if entry else None
+
+    request_headers = dict(headers)
+    if etag:
+        request_headers["If-None-Match"] = etag
+
+    try:
+        response = get_http_session(organization_url).get(url, headers=request_headers)
+    except requests.exceptions.RequestException as e:
+        if entry:
+            # Serving stale metadata beats failing the caller outright
+            return entry['data'], f"Success (stale cache, refresh failed: {e})"
+        return None, f"Request error: {e}"
+
+    not_modified = response.status_code == 304 and entry is not None
+    if not not_modified and response.status_code != 200:
+        return None, f"HTTP {response.status_code}: {response.text}"
+    data = None if not_modified else response.json()
+
+    with _cache_lock:
+        if not_modified:
+            cache_stats["not_modified"] += 1
+            entry['fetched_at'] = time.time()
+            message = "Success (revalidated)"
+        else:
+            cache_stats["fetched"] += 1
+            entry = {"etag": response.headers.get('ETag'), "data": data, "fetched_at": time.time()}
+            message = "Success"
+        _load_cache()[url] = entry
+        try:
+            _save_cache()
+        except OSError as e:
+            print(f"Could not persist metadata cache: {e}")
+    return entry['data'], message
+
+def invalidate_metadata(url_fragment=None):
+    """Drop cached entries whose URL contains url_fragment (everything when None)"""
+    with _cache_lock:
+        cache = _load_cache()
+        for url in [url for url in cache if url_fragment is None or url_fragment in url]:
+            del cache[url]
+        _save_cache()
+    with _tool_cache_lock:
+        for key in [key for key in _tool_cache if url_fragment is None or url_fragment in key]:
+            del _tool_cache[key]
+
+def get_projects(organization_url, headers):
+    """List the projects of the organization"""
+    data, message = get_cached_json(f"{organization_url}/_apis/projects?$top=500&api-version=7.0", headers, "projects", organization_url=organization_url)
+    return (data.get('value', []) if data else None), message
+
+def get_teams(organization_url, project, headers):
+    """List the teams of a project"""
+    data, message = get_cached_json(f"{organization_url}/_apis/projects/{project}/teams?$top=500&api-version=7.0", headers, "teams", organization_url=organization_url)
+    return (data.get('value', []) if data else None), message
+
+def get_iterations(organization_url, project, team, headers):
+    """List the iterations assigned to a team"""
+    data, message = get_cached_json(f"{organization_url}/{project}/{team}/_apis/work/teamsettings/iterations?api-version=7.0", headers, "iterations", organization_url=organization_url)
+    return (data.get('value', []) if data else None), message
+
+def get_area_paths(organization_url, project, headers, revalidate=True):
+    """Return every area path of a project as a flat list of backslash separated paths"""
+    data, message = get_cached_json(f"{organization_url}/{project}/_apis/wit/classificationnodes/Areas?$depth=20&api-version=7.0", headers, "area_paths", revalidate, organization_url)
+    if data is None:
+        return None, message
+
+    paths = []
+    def walk(node, parent):
+        path = f"{parent}\\{node['name']}" if parent else node['name']
+        paths.append(path)
+        for child in node.get('children', []):
+            walk(child, path)
+    walk(data, "")
+    return paths, message
+
+def get_work_item_types(organization_url, project, headers, revalidate=True):
+    """List the work item type names of a project"""
+    data, message = get_cached_json(f"{organization_url}/{project}/_apis/wit/workitemtypes?api-version=7.0", headers, "work_item_types", revalidate, organization_url)
+    return ([item['name'] for item in data.get('value', [])] if data else None), message
+
+def get_fields(organization_url, project, headers):
+    """List field definitions of a project"""
+    data, message = get_cached_json(f"{organization_url}/{project}/_apis/wit/fields?api-version=7.0", headers, "fields", organization_url=organization_url)
+    return (data.get('value', []) if data else None), message
+
+def install_metadata_tool_cache(connector, scope=""):
+    """Serve repeated metadata MCP tool calls from an in-process TTL cache, keyed per scope (organization)"""
+    original_call_tool = connector.call_tool
+
+    async def call_tool(name, arguments):
+        ttl = METADATA_TOOL_TTLS.get(name)
+        if ttl is None:
+            return await original_call_tool(name, arguments)
+
+        key = f"{scope}:{name}:{json.dumps(arguments, sort_keys=True)}"
+        with _tool_cache_lock:
+            cached = _tool_cache.get(key)
+            if cached and time.time() - cached[0] < ttl:
+                _tool_cache.move_to_end(key)
+                cache_stats["tool_hits"] += 1
+                return cached[1]
+            cache_stats["tool_misses"] += 1
+
+        result = await original_call_tool(name, arguments)
+        if not getattr(result, "isError", False):
+            with _tool_cache_lock:
+                _tool_cache[key] = (time.time(), result)
+                _tool_cache.move_to_end(key)
+                while len(_tool_cache) > MAX_TOOL_CACHE_ENTRIES:
+                    _tool_cache.popitem(last=False)
+        return result
+
+    connector.call_tool = call_tool
@@ -0,0 +1,170 @@
+import os
+import re
+import json
+import time
+import asyncio
+import threading
+from langchain_core.callbacks import BaseCallbackHandler
+from InstantDBScriptMaker import load_env_config
+
+# Per-request budgets for MCPAgent runs. Each query is classified, gets wall time,
+# LLM token and tool call limits for its class, and is stopped with a partial
+# answer as soon as any of them runs out.
+script_dir = os.path.dirname(os.path.abspath(__file__))
+BUDGET_LOG_PATH = os.path.join(script_dir, ".adobuddy", "budget_hits.jsonl")
+
+QUERY_BUDGETS = {
+    "lookup": {"wall_seconds": 45, "llm_tokens": 20000, "tool_calls": 6, "max_steps": 8, "max_tokens": 800},
+    "update": {"wall_seconds": 60, "llm_tokens": 30000, "tool_calls": 10, "max_steps": 12, "max_tokens": 800},
+    "analysis": {"wall_seconds": 120, "llm_tokens": 60000, "tool_calls": 20, "max_steps": 30, "max_tokens": 1500},
+}
+
+_UPDATE_WORDS = r"\b(update|set|change|assign|comment|close|resolve|move|add|link|tag)\b"
+_ANALYSIS_WORDS = r"\b(analy[sz]e|summari[sz]e|compare|trend|why|root cause|report|breakdown)\b"
+
+_log_lock = threading.Lock()
+
+def classify_query(user_message):
+    """Return the budget class for a query: lookup, update or analysis"""
+    message = str(user_message).lower()
+    if re.search(_ANALYSIS_WORDS, message) or len(message) > 300:
+        return "analysis"
+    if re.search(_UPDATE_WORDS, message):
+        return "update"
+    return "lookup"
+
+def get_budget(query_class):
+    """Budget for a class, with overrides such as ADOBUDDY_BUDGET_LOOKUP=wall_seconds=30,tool_calls=4"""
+    budget = dict(QUERY_BUDGETS.get(query_class, QUERY_BUDGETS["analysis"]))
+    key = f"ADOBUDDY_BUDGET_{query_class.upper()}"
+    overrides = os.environ.get(key) or load_env_config().get(key, "")
+    for item in overrides.split(","):
+        if "=" in item:
+            name, value = (part.strip() for part in item.split("=", 1))
+            if name in budget:
+                try:
+                    parsed = type(budget[name])(float(value))
+                except (ValueError, OverflowError):
+                    parsed = None
+                if parsed is None or parsed <= 0:
+                    # A typo in .env should not take every query of the class down with it
+                    print(f"Warning: ignoring {key} override {name}={value!r}; keeping {budget[name]}")
+                    continue
+                budget[name] = parsed
+    return budget
+
+class BudgetTracker(BaseCallbackHandler):
+    """Counts LLM tokens and tool calls for one run and cancels it when a limit is hit"""
+
+    def __init__(self, user_message, query_class, budget):
+        self.user_message = str(user_message)
+        self.query_class = query_class
+        self.budget = budget
+        self.started_at = time.monotonic()
+        self.llm_tokens = 0
+        self.llm_calls = 0
+        self.tool_calls = 0
+        self.exhausted = None
+        self.last_llm_text = ""
+        self.tool_outputs = []
+        self.task = None
+
+    def elapsed(self):
+        return time.monotonic() - self.started_at
+
+    def remaining_seconds(self):
+        return max(0.0, self.budget["wall_seconds"] - self.elapsed())
+
+    def exhaust(self, reason):
+        """Mark the budget as spent and stop the running agent task"""
+        if self.exhausted is None:
+            self.exhausted = reason
+            if self.task is not None and not self.task.done():
+                self.task.cancel()
+
+    def on_llm_end(self, response, **kwargs):
+        self.llm_calls += 1
+        usage = (response.llm_output or {}).get("token_usage") or {}
+        self.llm_tokens += usage.get("total_tokens", 0)
+        for generations in response.generations:
+            for generation in generations:
+                if generation.text:
+                    self.last_llm_text = generation.text
+        if self.llm_tokens >= self.budget["llm_tokens"]:
+            self.exhaust(f"LLM token budget of {self.budget['llm_tokens']} reached")
+
+    def record_tool_call(self, name):
+        self.tool_calls += 1
+        if self.tool_calls > self.budget["tool_calls"]:
+            self.exhaust(f"tool call budget of {self.budget['tool_calls']} reached")
+            raise asyncio.CancelledError()
+
+    def record_tool_output(self, name, result):
+        text = " ".join(getattr(item, "text", "") for item in getattr(result, "content", None) or [])
+        self.tool_outputs.append((name, text[:300]))
+
+    def partial_answer(self):
+        """Best effort answer assembled from what the agent gathered before it was stopped"""
+        answer = f"[Budget exhausted: {self.exhausted}. Returning a partial answer.]\n"
+        if self.last_llm_text:
+            answer += f"{self.last_llm_text}\n"
+        if self.tool_outputs:
+            answer += "Tool results gathered so far:\n"
+            for name, text in self.tool_outputs:
+                answer += f"  - {name}: {text}\n"
+        if not self.last_llm_text and not self.tool_outputs:
+            answer += "No results were gathered. Try a more specific question.\n"
+        return answer
+
+    def usage(self):
+        return {
+            "query_class": self.query_class,
+            "elapsed_seconds": round(self.elapsed(), 2),
+            "llm_tokens": self.llm_tokens,
+            "llm_calls": self.llm_calls,
+            "tool_calls": self.tool_calls,
+            "budget": self.budget,
+        }
+
+def install_tool_budget(connector, tracker):
+    """Wrap connector.call_tool so every tool call is counted against the run budget"""
+    original_call_tool = connector.call_tool
+
+    async def call_tool(name, arguments):
+        tracker.record_tool_call(name)
+        result = await original_call_tool(name, arguments)
+        tracker.record_tool_output(name, result)
+        return result
+
+    connector.call_tool = call_tool
+
+def record_budget_hit(tracker):
+    """Append the query that hit a limit to .adobuddy/budget_hits.jsonl"""
+    entry = dict(tracker.usage(), timestamp=time.time(), query=tracker.user_message, reason=tracker.exhausted)
+    try:
+        os.makedirs(os.path.dirname(BUDGET_LOG_PATH), exist_ok=True)
+        with _log_lock, open(BUDGET_LOG_PATH, "a", encoding="utf-8") as file:
+            file.write(json.dumps(entry) + "\n")
+    except OSError as e:
+        print(f"Could not record budget hit: {e}")
+
+async def run_with_budget(agent, user_message, tracker):
+    """Run the agent under the tracker's limits; returns (result, hit_limit)"""
+    tracker.task = asyncio.ensure_future(agent.run(user_message, max_steps=tracker.budget["max_steps"]))
+    try:
+        result = await asyncio.wait_for(asyncio.shield(tracker.task), timeout=tracker.remaining_seconds())
+        return result, False
+    except asyncio.TimeoutError:
+        tracker.exhaust(f"wall time budget of {tracker.budget['wall_seconds']}s reached")
+    except asyncio.CancelledError:
+        if tracker.exhausted is None:
+            # Cancelled from outside (e.g. the user), not by the budget
+            tracker.task.cancel()
+            raise
+
+    try:
+        await tracker.task
+    except (asyncio.CancelledError, Exception):
+        pass
+    record_budget_hit(tracker)
+    return tracker.partial_answer(), True
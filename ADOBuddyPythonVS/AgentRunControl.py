@@ -0,0 +1,79 @@
+import uuid
+import asyncio
+import threading
+
+# Tracks the agent run belonging to each browser session so that Clear or a new
+# submission cancels the previous run instead of letting it keep calling the LLM,
+# ADO and its MCP Node process in the background.
+
+cancel_metrics = {
+    "runs_started": 0,
+    "runs_completed": 0,
+    "runs_cancelled": 0,
+    "runs_superseded": 0,
+    "cancelled_llm_calls": 0,
+    "cancelled_tool_calls": 0,
+    "cancelled_seconds": 0.0,
+}
+
+_active_runs = {}
+_lock = threading.Lock()
+
+def run_key(session_hash=None):
+    """Key a run is tracked under: the browser session, or a key of its own for callers without one.
+
+    Runs without a session (API callers, scripts) must not share a key, or each would
+    cancel the other as a resubmit of the same session.
+    """
+    return session_hash or f"run-{uuid.uuid4().hex}"
+
+def register_run(session_key):
+    """Register the current task as the session's run, cancelling any run it replaces"""
+    task = asyncio.current_task()
+    with _lock:
+        previous = _active_runs.get(session_key)
+        _active_runs[session_key] = task
+        cancel_metrics["runs_started"] += 1
+        if previous is not None and previous is not task and not previous.done():
+            cancel_metrics["runs_superseded"] += 1
+            previous.cancel()
+    return task
+
+def finish_run(session_key, task, cancelled=False):
+    """Forget the session's run once it has ended"""
+    with _lock:
+        if _active_runs.get(session_key) is task:
+            del _active_runs[session_key]
+        if not cancelled:
+            cancel_metrics["runs_completed"] += 1
+
+def cancel_session_run(session_key):
+    """Cancel the run of a session (used by the Clear button); returns True if one was running"""
+    if not session_key:
+        return False
+    with _lock:
+        task = _active_runs.pop(session_key, None)
+    if task is not None and not task.done():
+        task.cancel()
+        return True
+    return False
+
+def record_cancelled_work(tracker=None):
+    """Account the work a cancelled run had already spent"""
+    with _lock:
+        cancel_metrics["runs_cancelled"] += 1
+        if tracker is not None:
+            usage = tracker.usage()
+            cancel_metrics["cancelled_llm_calls"] += usage["llm_calls"]
+            cancel_metrics["cancelled_tool_calls"] += usage["tool_calls"]
+            cancel_metrics["cancelled_seconds"] += usage["elapsed_seconds"]
+    print(format_cancel_metrics())
+
+def format_cancel_metrics():
+    """One line summary of cancelled work for the console"""
+    with _lock:
+        metrics = dict(cancel_metrics)
+    return (f"[cancel] {metrics['runs_cancelled']} run(s) cancelled "
+            f"({metrics['runs_superseded']} superseded by a resubmit) of {metrics['runs_started']} started; "
+            f"abandoned {metrics['cancelled_llm_calls']} LLM call(s), {metrics['cancelled_tool_calls']} tool call(s), "
+            f"{metrics['cancelled_seconds']:.1f}s of agent time")
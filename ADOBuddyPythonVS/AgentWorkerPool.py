@@ -0,0 +1,338 @@
+import os
+import sys
+import time
+import queue
+import asyncio
+import itertools
+import threading
+import multiprocessing
+from InstantDBScriptMaker import load_env_config
+from AgentBudget import QUERY_BUDGETS, get_budget
+
+# Agent turns normally run inside the Gradio process, sharing one event loop (and the
+# GIL) with every other chat session. In process mode each turn runs in one of a pool
+# of spawned worker processes instead.
+# Every worker keeps its own LLM connection pool (and, with ADOBUDDY_MCP_SESSIONS=shared,
+# warm MCP sessions), runs one turn at a time and streams the chunks back over a queue.
+# A run that overstays its timeout is cancelled; if it does not stop, its worker is
+# killed and replaced.
+#
+#   ADOBUDDY_EXECUTION_MODE=inline | process
+#   ADOBUDDY_AGENT_WORKERS=<n>           (default: CPU count, at most 4)
+#   ADOBUDDY_AGENT_RUN_TIMEOUT=<seconds> (default: longest wall budget plus 120)
+#
+# The tool result and metadata caches live in the workers, so cache invalidations
+# from the service hook receiver (which runs in the UI process) are forwarded to
+# every worker with forward_invalidation.
+MAX_DEFAULT_WORKERS = 4
+RUN_TIMEOUT_MARGIN_SECONDS = 120  # the answer is streamed out after the agent finishes
+CANCEL_GRACE_SECONDS = 10
+WORKER_START_TIMEOUT = 120
+
+def _setting(name, default=None):
+    return os.environ.get(name) or load_env_config().get(name, default)
+
+def get_execution_mode():
+    """Return inline or process from the environment or .env"""
+    mode = (_setting("ADOBUDDY_EXECUTION_MODE", "inline") or "inline").strip().lower()
+    return mode if mode == "process" else "inline"
+
+def _default_run_timeout():
+    return max(get_budget(query_class)["wall_seconds"] for query_class in QUERY_BUDGETS) + RUN_TIMEOUT_MARGIN_SECONDS
+
+# --- Worker process side ---
+
+def _worker_main(inbox, outbox):
+    """Entry point of a spawned worker process"""
+    asyncio.run(_serve_runs(inbox, outbox))
+
+def _load_app():
+    # Started from ADOBuddyPythonVS.py, spawn has already imported the app as __mp_main__
+    app = sys.modules.get("__mp_main__")
+    if getattr(app, "process_query", None) is None:
+        import ADOBuddyPythonVS as app
+    return app
+
+async def _run_one(app, registry, run_id, payload, outbox, http_async_client):
+    message, organization_name = payload
+    try:
+        organization = (registry.get(organization_name) if organization_name else None) or registry.resolve(message)
+        session_pool = await app.get_shared_session_pool(organization)
+        async for chunk in app.process_query(message, session_pool=session_pool,
+                                             http_async_client=http_async_client, organization=organization):
+            outbox.put(("chunk", run_id, chunk))
+        outbox.put(("done", run_id, None))
+    except asyncio.CancelledError:
+        outbox.put(("cancelled", run_id, None))
+    except Exception as e:
+        outbox.put(("error", run_id, str(e)))
+
+def _apply_invalidation(kind, argument):
+    from ToolResultShaper import invalidate_results
+    from AdoMetadataCache import invalidate_metadata
+
+    if kind == "results":
+        invalidate_results(**(argument or {}))
+    elif kind == "metadata":
+        invalidate_metadata(argument)
+
+async def _serve_runs(inbox, outbox):
+    import httpx
+    from OrgRegistry import get_org_registry
+
+    app = _load_app()
+    registry = get_org_registry()
+    loop = asyncio.get_running_loop()
+    commands = asyncio.Queue()
+
+    def read_inbox():
+        while True:
+            command = inbox.get()
+            loop.call_soon_threadsafe(commands.put_nowait, command)
+            if command[0] == "stop":
+                return
+
+    threading.Thread(target=read_inbox, daemon=True).start()
+    running = {}
+
+    async with httpx.AsyncClient() as http_async_client:
+        try:
+            # Warm the default organization's MCP sessions before taking runs (shared session mode)
+            try:
+                await app.get_shared_session_pool(registry.default)
+            except Exception as e:
+                print(f"Agent worker {os.getpid()}: MCP warm-up failed: {e}")
+            outbox.put(("ready", None, os.getpid()))
+
+            while True:
+                command, run_id, payload = await commands.get()
+                if command == "stop":
+                    break
+                if command == "invalidate":
+                    _apply_invalidation(*payload)
+                elif command == "cancel":
+                    task = running.get(run_id)
+                    if task is not None:
+                        task.cancel()
+                elif command == "run":
+                    task = asyncio.create_task(_run_one(app, registry, run_id, payload, outbox, http_async_client))
+                    running[run_id] = task
+                    task.add_done_callback(lambda _task, run_id=run_id: running.pop(run_id, None))
+        finally:
+            for task in list(running.values()):
+                task.cancel()
+            await registry.close_session_pools()
+
+# --- UI process side ---
+
+class _Worker:
+    """Handle on one worker process and its queues"""
+
+    def __init__(self, context, index):
+        self.index = index
+        self.inbox = context.Queue()
+        self.outbox = context.Queue()
+        self.process = context.Process(target=_worker_main, args=(self.inbox, self.outbox),
+                                       name=f"adobuddy-agent-{index}", daemon=True)
+        self.process.start()
+        self.ready = False
+        self.messages = None
+        self._stopped = False
+
+    def attach(self, loop):
+        """Forward the worker's messages onto an asyncio queue of the given loop"""
+        if self.messages is None:
+            self.messages = asyncio.Queue()
+            threading.Thread(target=self._read_outbox, args=(loop,), daemon=True).start()
+
+    def _read_outbox(self, loop):
+        while not self._stopped:
+            try:
+                message = self.outbox.get(timeout=1)
+            except queue.Empty:
+                if self.process.is_alive():
+                    continue
+                message = ("exited", None, self.process.exitcode)
+            except (OSError, EOFError, ValueError):
+                return
+            try:
+                loop.call_soon_threadsafe(self.messages.put_nowait, message)
+            except RuntimeError:
+                return  # the event loop is closed
+            if message[0] == "exited":
+                return
+
+    def send(self, command, run_id=None, payload=None):
+        try:
+            self.inbox.put((command, run_id, payload))
+        except (OSError, ValueError):
+            pass
+
+    def stop(self, timeout=5):
+        """Stop the process, killing it if it does not exit in time"""
+        if self.process.is_alive() and timeout:
+            self.send("stop")
+            self.process.join(timeout)
+        if self.process.is_alive():
+            # The MCP Node processes of a killed worker exit when their stdin closes
+            self.process.kill()
+            self.process.join()
+        self._stopped = True
+
+class AgentWorkerPool:
+    """Runs agent turns in spawned worker processes and streams their output back"""
+
+    def __init__(self, size=None, run_timeout=None):
+        self.size = max(1, int(size or _setting("ADOBUDDY_AGENT_WORKERS", 0) or min(os.cpu_count() or 1, MAX_DEFAULT_WORKERS)))
+        self.run_timeout = float(run_timeout or _setting("ADOBUDDY_AGENT_RUN_TIMEOUT", 0) or _default_run_timeout())
+        self.stats = {"runs": 0, "completed": 0, "cancelled": 0, "timeouts": 0, "respawns": 0}
+        self._context = multiprocessing.get_context("spawn")
+        self._workers = []
+        self._idle = None
+        self._loop = None
+        self._recoveries = set()
+        self._run_ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Spawn the workers; they warm up in the background until the first run needs them"""
+        with self._lock:
+            if not self._workers:
+                self._workers = [_Worker(self._context, index) for index in range(self.size)]
+        return self
+
+    def _idle_workers(self):
+        if self._idle is None:
+            self.start()
+            self._loop = asyncio.get_running_loop()
+            self._idle = asyncio.Queue()
+            for worker in self._workers:
+                worker.attach(self._loop)
+                self._idle.put_nowait(worker)
+        return self._idle
+
+    async def _wait_ready(self, worker):
+        deadline = time.monotonic() + WORKER_START_TIMEOUT
+        while not worker.ready:
+            try:
+                kind, _, payload = await asyncio.wait_for(worker.messages.get(), deadline - time.monotonic())
+            except asyncio.TimeoutError:
+                raise RuntimeError(f"agent worker did not start within {WORKER_START_TIMEOUT}s")
+            if kind == "exited":
+                raise RuntimeError(f"agent worker exited during start-up (exit code {payload})")
+            worker.ready = kind == "ready"
+
+    async def stream(self, message, organization_name=None):
+        """Run one agent turn in a worker, yielding its output chunks as they arrive"""
+        idle = self._idle_workers()
+        worker = await idle.get()
+        run_id = next(self._run_ids)
+        sent = False
+        finished = False
+        try:
+            await self._wait_ready(worker)
+            worker.send("run", run_id, (message, organization_name))
+            sent = True
+            self.stats["runs"] += 1
+            deadline = time.monotonic() + self.run_timeout
+            while not finished:
+                try:
+                    batch = [await asyncio.wait_for(worker.messages.get(), deadline - time.monotonic())]
+                except asyncio.TimeoutError:
+                    self.stats["timeouts"] += 1
+                    yield f"\n[Agent run stopped after {self.run_timeout:.0f}s]\n"
+                    return
+                # Chunks that piled up while the UI was busy go out as one update
+                while not worker.messages.empty():
+                    batch.append(worker.messages.get_nowait())
+
+                text = []
+                exited = False
+                for kind, message_run_id, payload in batch:
+                    if kind == "exited":
+                        text.append(f"\nError: agent worker exited unexpectedly (exit code {payload})\n")
+                        exited = True
+                        break
+                    if message_run_id != run_id:
+                        continue
+                    if kind == "chunk":
+                        text.append(payload)
+                    elif kind == "error":
+                        text.append(f"Error: {payload}\n")
+                        finished = True
+                    elif kind in ("done", "cancelled"):
+                        finished = True
+                if text:
+                    yield "".join(text)
+                if exited:
+                    return
+            self.stats["completed"] += 1
+        finally:
+            if finished or (not sent and worker.ready):
+                idle.put_nowait(worker)
+            else:
+                # Cancelled, timed out or dead: the worker is reused only once the run has stopped
+                recovery = self._loop.create_task(self._recover(worker, run_id if sent else None))
+                self._recoveries.add(recovery)
+                recovery.add_done_callback(self._recoveries.discard)
+
+    async def _recover(self, worker, run_id):
+        """Return a worker to the pool once it has stopped the run, replacing it if it does not"""
+        if run_id is not None and worker.process.is_alive():
+            self.stats["cancelled"] += 1
+            worker.send("cancel", run_id)
+            deadline = time.monotonic() + CANCEL_GRACE_SECONDS
+            while True:
+                try:
+                    kind, message_run_id, _ = await asyncio.wait_for(worker.messages.get(), deadline - time.monotonic())
+                except asyncio.TimeoutError:
+                    break
+                if kind == "exited":
+                    break
+                if message_run_id == run_id and kind in ("done", "cancelled", "error"):
+                    self._idle.put_nowait(worker)
+                    return
+
+        self.stats["respawns"] += 1
+        print(f"Replacing agent worker {worker.index} (pid {worker.process.pid})")
+        await asyncio.to_thread(worker.stop, 0)
+        replacement = _Worker(self._context, worker.index)
+        replacement.attach(self._loop)
+        self._workers[worker.index] = replacement
+        self._idle.put_nowait(replacement)
+
+    def broadcast(self, command, payload=None):
+        """Send a command to every worker; it is handled between (and during) runs"""
+        with self._lock:
+            workers = list(self._workers)
+        for worker in workers:
+            worker.send(command, None, payload)
+
+    def close(self):
+        """Stop every worker process"""
+        with self._lock:
+            workers, self._workers = self._workers, []
+        for worker in workers:
+            worker.stop()
+        self._idle = None
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_agent_worker_pool():
+    """Process-wide worker pool, created on first use"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = AgentWorkerPool()
+        return _pool
+
+def forward_invalidation(kind, argument=None):
+    """Forward a cache invalidation to the workers.
+
+    "results" takes the keyword arguments of invalidate_results, "metadata" a project.
+    """
+    with _pool_lock:
+        pool = _pool
+    if pool is not None:
+        pool.broadcast("invalidate", (kind, argument))
@@ -0,0 +1,130 @@
+"""
+Headless batch runner for the ADO assistant.
+
+Reads queries from a JSONL file ({"id": ..., "query": ...} per line, or a plain
+string per line), runs them through the process_query pipeline with bounded
+concurrency over shared per-organization MCP sessions and a shared LLM connection pool, and streams
+one JSON result per query (with timing) to the output file as each one finishes.
+
+    python BatchQueryRunner.py morning_status.jsonl -o results.jsonl -c 4
+"""
+
+import sys
+import json
+import time
+import asyncio
+import argparse
+import httpx
+from ADOBuddyPythonVS import process_query
+from OrgRegistry import get_org_registry
+from TrafficRecorder import get_traffic_mode
+
+ANSWER_MARKER = "[Step 4/4] Returning output...\n"
+
+def is_status_line(chunk):
+    """Progress/log lines such as "[Step 1/4] ..." or "[log] ..." that are not part of the answer"""
+    return chunk.startswith("[") and "]" in chunk and chunk.endswith("\n") and chunk.count("\n") == 1
+
+def load_queries(path):
+    """Return [(id, query)] from a JSONL file; plain text lines are accepted too"""
+    queries = []
+    with open(path, 'r', encoding='utf-8') as file:
+        for line_number, line in enumerate(file, start=1):
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            try:
+                item = json.loads(line)
+            except json.JSONDecodeError:
+                item = line
+            if isinstance(item, dict):
+                queries.append((item.get("id", line_number), item["query"]))
+            else:
+                queries.append((line_number, str(item)))
+    return queries
+
+async def run_query(query_id, query, session_pool_size, http_async_client):
+    """Run one query to completion and return its result record"""
+    started_at = time.time()
+    started = time.perf_counter()
+    first_chunk_seconds = None
+    chunks = []
+    error = None
+    organization = get_org_registry().resolve(query)
+    try:
+        # Each organization gets its own warm session pool (none in replay mode)
+        session_pool = await organization.get_session_pool(session_pool_size) if session_pool_size else None
+        async for chunk in process_query(query, session_pool=session_pool, http_async_client=http_async_client,
+                                         organization=organization, raise_errors=True):
+            # Time to the first piece of the answer, not to the first progress line
+            if first_chunk_seconds is None and not is_status_line(chunk):
+                first_chunk_seconds = time.perf_counter() - started
+            chunks.append(chunk)
+    except Exception as e:
+        error = str(e) or type(e).__name__
+
+    output = "".join(chunks)
+    answer = output.split(ANSWER_MARKER, 1)[1] if ANSWER_MARKER in output else output
+    return {
+        "id": query_id,
+        "query": query,
+        "organization": organization.name,
+        "answer": answer.strip(),
+        "output": output,
+        "error": error,
+        "started_at": started_at,
+        "seconds": round(time.perf_counter() - started, 3),
+        "first_chunk_seconds": round(first_chunk_seconds, 3) if first_chunk_seconds is not None else None,
+    }
+
+async def run_batch(queries, output_path, concurrency=4):
+    """Run all queries with at most `concurrency` in flight; returns the result records"""
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    results = []
+    session_pool_size = concurrency if get_traffic_mode() != "replay" else 0
+    started = time.perf_counter()
+
+    async with httpx.AsyncClient(limits=httpx.Limits(max_connections=concurrency * 2)) as http_async_client:
+        try:
+            with open(output_path, 'w', encoding='utf-8') as output_file:
+                async def worker(query_id, query):
+                    async with semaphore:
+                        result = await run_query(query_id, query, session_pool_size, http_async_client)
+                    # Stream results as they complete so partial runs are still useful
+                    output_file.write(json.dumps(result) + "\n")
+                    output_file.flush()
+                    results.append(result)
+                    status = "error" if result["error"] else "ok"
+                    print(f"[{len(results)}/{len(queries)}] {query_id}: {status} in {result['seconds']}s")
+
+                await asyncio.gather(*(worker(query_id, query) for query_id, query in queries))
+        finally:
+            await get_org_registry().close_session_pools()
+
+    elapsed = time.perf_counter() - started
+    durations = sorted(result["seconds"] for result in results)
+    if durations:
+        p50 = durations[len(durations) // 2]
+        p95 = durations[min(len(durations) - 1, int(len(durations) * 0.95))]
+        print(f"Completed {len(results)} queries in {elapsed:.1f}s "
+              f"({len(results) / elapsed:.2f} queries/s, p50 {p50:.1f}s, p95 {p95:.1f}s)")
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Run ADO assistant queries headlessly and write JSONL results")
+    parser.add_argument("input", help="JSONL file of queries ({\"id\": ..., \"query\": ...} or a string per line)")
+    parser.add_argument("-o", "--output", default="results.jsonl", help="JSONL file to stream results to")
+    parser.add_argument("-c", "--concurrency", type=int, default=4, help="Number of queries run at the same time")
+    args = parser.parse_args()
+
+    queries = load_queries(args.input)
+    if not queries:
+        print(f"No queries found in {args.input}")
+        sys.exit(1)
+
+    print(f"Running {len(queries)} queries with concurrency {args.concurrency}...")
+    results = asyncio.run(run_batch(queries, args.output, args.concurrency))
+    sys.exit(1 if any(result["error"] for result in results) else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,235 @@
+import re
+import json
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import requests
+from AdoAuth import get_organization_url, get_ado_auth_token, build_ado_headers, get_http_session
+
+# Bulk field updates and comments for many work items in one go. Updates are sent
+# through the work item $batch endpoint (200 items per request) with a bounded
+# number of batch requests in flight, instead of one agent tool call per item.
+BATCH_SIZE = 200
+DEFAULT_MAX_CONCURRENCY = 4
+DRY_RUN_PREVIEW = 10
+
+def build_patch_operations(field_updates=None, comment=None):
+    """Turn {field: value} and an optional comment into JSON patch operations"""
+    operations = []
+    for field, value in (field_updates or {}).items():
+        operations.append({
+            "op": "add",
+            "path": f"/fields/{field}",
+            "value": value
+        })
+    if comment:
+        # Writing System.History adds a discussion comment and is batchable, unlike the comments API
+        operations.append({
+            "op": "add",
+            "path": "/fields/System.History",
+            "value": comment
+        })
+    return operations
+
+def resolve_work_item_ids(organization_url, project, headers, ids=None, wiql=None):
+    """Return the target ids from an explicit list or a WIQL query"""
+    if ids:
+        return sorted(set(int(work_item_id) for work_item_id in ids))
+
+    url = f"{organization_url}/{project}/_apis/wit/wiql?api-version=7.0"
+    response = get_http_session(organization_url).post(url, json={"query": wiql}, headers=headers)
+    response.raise_for_status()
+    return [item['id'] for item in response.json().get('workItems', [])]
+
+def _preview_work_items(organization_url, project, headers, ids):
+    """Fetch title and state for the first few targets of a dry run"""
+    url = f"{organization_url}/{project}/_apis/wit/workitemsbatch?api-version=7.0"
+    response = get_http_session(organization_url).post(
+        url,
+        json={"ids": ids[:DRY_RUN_PREVIEW], "fields": ["System.Id", "System.Title", "System.State"], "errorPolicy": "omit"},
+        headers=headers
+    )
+    response.raise_for_status()
+    return [item for item in response.json().get('value', []) if item]
+
+def _send_batch(organization_url, headers, batch_ids, operations):
+    """PATCH one chunk of work items through $batch; returns (succeeded_ids, failures)"""
+    body = [
+        {
+            "method": "PATCH",
+            "uri": f"/_apis/wit/workitems/{work_item_id}?api-version=7.0",
+            "headers": {"Content-Type": "application/json-patch+json"},
+            "body": operations
+        }
+        for work_item_id in batch_ids
+    ]
+    response = get_http_session(organization_url).patch(f"{organization_url}/_apis/wit/$batch?api-version=7.0", json=body, headers=headers)
+    if response.status_code != 200:
+        return [], [(work_item_id, f"HTTP {response.status_code}: {response.text}") for work_item_id in batch_ids]
+
+    succeeded, failures = [], []
+    for work_item_id, item_response in zip(batch_ids, response.json().get('value', [])):
+        if item_response.get('code') == 200:
+            succeeded.append(work_item_id)
+        else:
+            failures.append((work_item_id, f"HTTP {item_response.get('code')}: {item_response.get('body')}"))
+    return succeeded, failures
+
+def _send_batch_unless_cancelled(cancel_event, organization_url, headers, batch_ids, operations):
+    if cancel_event is not None and cancel_event.is_set():
+        return [], [(work_item_id, "Cancelled before sending") for work_item_id in batch_ids]
+    return _send_batch(organization_url, headers, batch_ids, operations)
+
+def iter_bulk_update(project, ids=None, wiql=None, field_updates=None, comment=None,
+                     dry_run=False, max_concurrency=DEFAULT_MAX_CONCURRENCY, organization_url=None,
+                     cancel_event=None):
+    """Run a bulk update, yielding progress lines suitable for streaming into the chat.
+
+    Setting cancel_event stops batches that have not been sent yet, even while the
+    consumer is not pulling lines.
+    """
+    operations = build_patch_operations(field_updates, comment)
+    if not operations:
+        yield "Nothing to update: specify at least one field or a comment.\n"
+        return
+    if not ids and not wiql:
+        yield "Nothing to update: specify work item ids or a WIQL query.\n"
+        return
+
+    organization_url = (organization_url or get_organization_url()).rstrip('/')
+    auth_token, use_pat, auth_message = get_ado_auth_token(organization_url)
+    if not auth_token:
+        yield f"❌ Authentication failed: {auth_message}\n"
+        return
+    headers = build_ado_headers(auth_token, use_pat)
+
+    try:
+        target_ids = resolve_work_item_ids(organization_url, project, headers, ids, wiql)
+    except requests.exceptions.RequestException as e:
+        yield f"❌ Could not resolve work items: {e}\n"
+        return
+
+    if not target_ids:
+        yield "No work items matched.\n"
+        return
+
+    yield f"Matched {len(target_ids)} work item(s) in {project}.\n"
+    yield "Patch:\n" + "".join(f"  {op['op']} {op['path']} = {op['value']!r}\n" for op in operations)
+
+    if dry_run:
+        try:
+            for work_item in _preview_work_items(organization_url, project, headers, target_ids):
+                fields = work_item.get('fields', {})
+                yield f"  would update #{work_item['id']} {fields.get('System.Title')} ({fields.get('System.State')})\n"
+        except requests.exceptions.RequestException as e:
+            yield f"  (preview unavailable: {e})\n"
+        if len(target_ids) > DRY_RUN_PREVIEW:
+            yield f"  ... and {len(target_ids) - DRY_RUN_PREVIEW} more\n"
+        yield "Dry run only - no work items were changed.\n"
+        return
+
+    batches = [target_ids[start:start + BATCH_SIZE] for start in range(0, len(target_ids), BATCH_SIZE)]
+    updated, failures = 0, []
+    with ThreadPoolExecutor(max_workers=max(1, max_concurrency)) as executor:
+        futures = {executor.submit(_send_batch_unless_cancelled, cancel_event, organization_url, headers,
+                                   batch_ids, operations): batch_ids
+                   for batch_ids in batches}
+        try:
+            for future in as_completed(futures):
+                try:
+                    succeeded, batch_failures = future.result()
+                except requests.exceptions.RequestException as e:
+                    succeeded, batch_failures = [], [(work_item_id, f"Request error: {e}") for work_item_id in futures[future]]
+                updated += len(succeeded)
+                failures.extend(batch_failures)
+                yield f"Progress: {updated + len(failures)}/{len(target_ids)} processed ({len(failures)} failed)\n"
+                if cancel_event is not None and cancel_event.is_set():
+                    yield f"Cancelled after {updated} update(s).\n"
+                    return
+        finally:
+            # If the consumer stops early (chat cancelled) do not send the batches that have not started
+            for future in futures:
+                future.cancel()
+
+    yield f"✅ Updated {updated} of {len(target_ids)} work item(s).\n"
+    for work_item_id, error in failures[:DRY_RUN_PREVIEW]:
+        yield f"  ❌ #{work_item_id}: {error}\n"
+
+def close_bulk_update(updates):
+    """Close a bulk update generator once the step running on another thread has returned"""
+    def close():
+        while True:
+            try:
+                updates.close()
+                return
+            except ValueError:
+                # "generator already executing": the in-flight next() has not returned yet
+                time.sleep(0.05)
+
+    threading.Thread(target=close, daemon=True).start()
+
+def parse_bulk_command(message):
+    """Parse a chat bulk command, returning iter_bulk_update kwargs or None.
+
+    Syntax:
+        bulk update <project> ids 1,2,3 set System.State=Closed; System.Tags=x comment "text" [dry-run]
+        bulk update <project> wiql "SELECT [System.Id] FROM WorkItems WHERE ..." set ... [dry-run]
+
+    dry-run is only recognised as the last token; quote a field value that ends with it.
+    """
+    match = re.match(r"\s*bulk update (?:in )?(?P<project>[\w-]+)\s+(?P<rest>.*)$", message, re.IGNORECASE | re.DOTALL)
+    if not match:
+        return None
+    rest = match.group('rest')
+
+    comment = None
+    comment_match = re.search(r"\bcomment\s+(['\"])(?P<comment>.*?)\1", rest, re.IGNORECASE | re.DOTALL)
+    if comment_match:
+        comment = comment_match.group('comment')
+        rest = rest[:comment_match.start()] + rest[comment_match.end():]
+
+    ids, wiql = None, None
+    wiql_match = re.search(r"\bwiql\s+(['\"])(?P<wiql>.*?)\1", rest, re.IGNORECASE | re.DOTALL)
+    if wiql_match:
+        wiql = wiql_match.group('wiql')
+        rest = rest[:wiql_match.start()] + rest[wiql_match.end():]
+    else:
+        ids_match = re.search(r"\bids?\s+(?P<ids>\d+(?:\s*,\s*\d+)*)", rest, re.IGNORECASE)
+        if ids_match:
+            ids = [int(work_item_id) for work_item_id in re.findall(r"\d+", ids_match.group('ids'))]
+            rest = rest[:ids_match.start()] + rest[ids_match.end():]
+
+    # Only a trailing flag counts, so field values and quoted text may contain "dry run"
+    dry_run_match = re.search(r"\s+dry-?run\s*$", rest, re.IGNORECASE)
+    dry_run = dry_run_match is not None
+    if dry_run_match:
+        rest = rest[:dry_run_match.start()]
+
+    field_updates = {}
+    set_match = re.search(r"\bset\s+(?P<fields>.*)$", rest, re.IGNORECASE | re.DOTALL)
+    if set_match:
+        # Assignments are separated by ';' outside quotes, so quoted values may contain one
+        assignments = re.finditer(r"(?P<field>[^;=]+?)\s*=\s*(?:(?P<quote>['\"])(?P<quoted>.*?)(?P=quote)|(?P<value>[^;]*))",
+                                  set_match.group('fields'), re.DOTALL)
+        for assignment in assignments:
+            value = assignment.group('quoted') if assignment.group('quote') else assignment.group('value').strip()
+            field_updates[assignment.group('field').strip()] = value
+
+    return {
+        "project": match.group('project'),
+        "ids": ids,
+        "wiql": wiql,
+        "field_updates": field_updates,
+        "comment": comment,
+        "dry_run": dry_run
+    }
+
+if __name__ == "__main__":
+    import sys
+    command = parse_bulk_command(" ".join(sys.argv[1:]))
+    if not command:
+        print(parse_bulk_command.__doc__)
+        sys.exit(1)
+    print(json.dumps(command, indent=2))
+    for line in iter_bulk_update(**command):
+        print(line, end="")
@@ -1,15 +1,29 @@
 ﻿import requests
 import os
-import base64
 import subprocess
 import json
 from azure.devops.connection import Connection
 from azure.devops.v7_0.work_item_tracking.models import JsonPatchOperation
 from msrest.authentication import BasicAuthentication
-import sys
+import csv
+import time
+import hashlib
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 
 def authenticate_azure_cli_powershell():
     """Authenticate using Azure CLI via PowerShell and return access token"""
+    # Shares the in-flight fetch with the other modules; results are (token, message)
+    from AdoAuth import token_flight, AZURE_DEVOPS_RESOURCE
+    access_token, _ = token_flight.do(AZURE_DEVOPS_RESOURCE, _fetch_azure_cli_token)
+    return access_token
+
+def _fetch_azure_cli_token():
+    access_token = _authenticate_azure_cli_powershell()
+    return access_token, "Success" if access_token else "Failed to get access token from Azure CLI"
+
+def _authenticate_azure_cli_powershell():
     try:
         print("Checking Azure CLI login status via PowerShell...")
         
@@ -44,11 +58,12 @@ def authenticate_azure_cli_powershell():
         print(f"Error during Azure CLI PowerShell authentication: {e}")
         return None
 
-def create_work_item_with_powershell_auth(organization_url, project, work_item_type, title, description):
+def create_work_item_with_powershell_auth(organization_url, project, work_item_type, title, description, access_token=None):
     """Create work item using Azure DevOps client with PowerShell Azure CLI authentication"""
     try:
-        # Get access token from PowerShell Azure CLI
-        access_token = authenticate_azure_cli_powershell()
+        # Get access token from PowerShell Azure CLI unless the caller already has one
+        if access_token is None:
+            access_token = authenticate_azure_cli_powershell()
         if not access_token:
             return None
         
@@ -149,13 +164,287 @@ def verify_azure_cli_installation():
         print(f"Error checking Azure CLI installation: {e}")
         return False
 
+# Bulk creation from CSV/JSONL/JSON. Rows are streamed, each one is tagged with an import
+# key and recorded in an append-only checkpoint file (pending before it is sent,
+# created once ADO returns its id), so an interrupted import can be rerun with the
+# same file and only creates what is missing. Rows left pending by the interruption
+# are looked up by their import tag before being sent again.
+DEFAULT_BULK_CONCURRENCY = 8
+IMPORT_TAG_PREFIX = "import-"
+MAX_CREATE_ATTEMPTS = 4
+
+# Friendly column names accepted in the input file; columns containing a dot are used as field reference names
+FIELD_ALIASES = {
+    "title": "System.Title",
+    "description": "System.Description",
+    "state": "System.State",
+    "assignedto": "System.AssignedTo",
+    "tags": "System.Tags",
+    "areapath": "System.AreaPath",
+    "iterationpath": "System.IterationPath",
+    "priority": "Microsoft.VSTS.Common.Priority",
+    "reprosteps": "Microsoft.VSTS.TCM.ReproSteps",
+}
+_NON_FIELD_COLUMNS = {"importkey", "workitemtype", "type"}
+
+def print_login_help():
+    print("Failed to authenticate with Azure CLI via PowerShell")
+    print("\nTo resolve this issue:")
+    print("1. Open PowerShell as Administrator")
+    print("2. Run: az login")
+    print("3. Complete the authentication process")
+    print("4. Run this script again")
+
+def iter_import_rows(path):
+    """Yield (row_number, row) from a CSV, JSONL or JSON array file; CSV and JSONL are read one row at a time"""
+    if path.lower().endswith(".json"):
+        with open(path, 'r', encoding='utf-8-sig') as file:
+            rows = json.load(file)
+        if not isinstance(rows, list):
+            raise ValueError(f"{path} must contain a JSON array of work item objects")
+        for row_number, row in enumerate(rows, start=1):
+            yield row_number, _checked_row(path, row_number, row)
+    elif path.lower().endswith(".jsonl"):
+        with open(path, 'r', encoding='utf-8') as file:
+            for row_number, line in enumerate(file, start=1):
+                if line.strip():
+                    yield row_number, _checked_row(path, row_number, json.loads(line))
+    else:
+        with open(path, 'r', newline='', encoding='utf-8-sig') as file:
+            for row_number, row in enumerate(csv.DictReader(file), start=1):
+                yield row_number, row
+
+def _checked_row(path, row_number, row):
+    if not isinstance(row, dict):
+        raise ValueError(f"{path} row {row_number}: expected a JSON object, got {type(row).__name__}")
+    return row
+
+def row_import_key(row_number, row):
+    """Stable key for a row: its ImportKey column, or a hash of its position and content"""
+    for column, value in row.items():
+        if column.replace(" ", "").lower() == "importkey" and value:
+            return str(value)
+    canonical = json.dumps([row_number, row], sort_keys=True, default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:16]
+
+def build_row_patch_document(row, import_key):
+    """JSON patch document for one input row, tagged with its import key"""
+    fields = {}
+    for column, value in row.items():
+        if value is None or value == "" or column.replace(" ", "").lower() in _NON_FIELD_COLUMNS:
+            continue
+        field = column if "." in column else FIELD_ALIASES.get(column.replace(" ", "").lower())
+        if field:
+            fields[field] = value
+    fields.setdefault("System.State", "New")
+    tags = [tag.strip() for tag in str(fields.get("System.Tags", "")).split(";") if tag.strip()]
+    fields["System.Tags"] = "; ".join(tags + [f"{IMPORT_TAG_PREFIX}{import_key}"])
+    return [{"op": "add", "path": f"/fields/{field}", "value": value} for field, value in fields.items()]
+
+def _row_work_item_type(row, default_type):
+    for column, value in row.items():
+        if column.replace(" ", "").lower() in ("workitemtype", "type") and value:
+            return value
+    return default_type
+
+class ImportCheckpoint:
+    """Append-only JSONL record of which rows are pending and which were created"""
+
+    def __init__(self, path):
+        self.path = path
+        self.created = {}
+        self.pending = {}
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as file:
+                for line in file:
+                    if not line.strip():
+                        continue
+                    entry = json.loads(line)
+                    if entry["status"] == "created":
+                        self.created[entry["key"]] = entry["id"]
+                        self.pending.pop(entry["key"], None)
+                    elif entry["key"] not in self.created:
+                        self.pending[entry["key"]] = entry["row"]
+        self._file = open(path, 'a', encoding='utf-8')
+
+    def _append(self, entry):
+        with self._lock:
+            self._file.write(json.dumps(entry) + "\n")
+            self._file.flush()
+
+    def mark_pending(self, key, row_number):
+        self._append({"key": key, "row": row_number, "status": "pending"})
+
+    def mark_created(self, key, row_number, work_item_id):
+        with self._lock:
+            self.created[key] = work_item_id
+            self.pending.pop(key, None)
+        self._append({"key": key, "row": row_number, "status": "created", "id": work_item_id})
+
+    def close(self):
+        self._file.close()
+
+class _TokenHolder:
+    """The one access token of a bulk run, refreshed once when ADO starts rejecting it"""
+
+    def __init__(self, access_token):
+        self.access_token = access_token
+        self._lock = threading.Lock()
+
+    def refresh(self, rejected_token):
+        with self._lock:
+            if self.access_token == rejected_token:
+                self.access_token = authenticate_azure_cli_powershell() or rejected_token
+            return self.access_token
+
+def _send_with_retry(session, tokens, method, url, already_applied=None, **kwargs):
+    """Send a request with the shared token, refreshing it on 401 and backing off on throttling.
+
+    A non-idempotent request passes already_applied, which is checked before each
+    retry after a 429/503 (the server may have applied it anyway); when it returns
+    True nothing is resent and None is returned.
+    """
+    base_headers = kwargs.pop("headers", None) or {}
+    response = None
+    for attempt in range(MAX_CREATE_ATTEMPTS):
+        access_token = tokens.access_token
+        headers = dict(base_headers, Authorization=f"Bearer {access_token}")
+        response = session.request(method, url, headers=headers, **kwargs)
+        if response.status_code == 401 and attempt == 0:
+            tokens.refresh(access_token)
+            continue
+        if response.status_code in (429, 503) and attempt < MAX_CREATE_ATTEMPTS - 1:
+            time.sleep(float(response.headers.get("Retry-After", 2 ** attempt)))
+            if already_applied is not None and already_applied():
+                return None
+            continue
+        break
+    response.raise_for_status()
+    return response
+
+def find_imported_work_item(session, tokens, organization_url, project, import_key):
+    """Id of a work item already created for an import key, or None"""
+    query = (f"SELECT [System.Id] FROM WorkItems WHERE [System.TeamProject] = @project "
+             f"AND [System.Tags] CONTAINS '{IMPORT_TAG_PREFIX}{import_key}'")
+    response = _send_with_retry(session, tokens, "POST", f"{organization_url}/{project}/_apis/wit/wiql?api-version=7.0",
+                                json={"query": query}, headers={"Content-Type": "application/json"})
+    work_items = response.json().get("workItems", [])
+    return work_items[0]["id"] if work_items else None
+
+def _create_row(session, tokens, checkpoint, organization_url, project, default_type, row_number, row, import_key):
+    """Create one row's work item; returns its id"""
+    if import_key in checkpoint.pending:
+        # Sent before the interruption but never confirmed: it may exist already
+        existing_id = find_imported_work_item(session, tokens, organization_url, project, import_key)
+        if existing_id is not None:
+            checkpoint.mark_created(import_key, row_number, existing_id)
+            return existing_id
+
+    work_item_type = _row_work_item_type(row, default_type)
+    checkpoint.mark_pending(import_key, row_number)
+    found = []
+
+    def created_despite_error():
+        # A create answered with 503 may still have gone through; never create the row twice
+        existing_id = find_imported_work_item(session, tokens, organization_url, project, import_key)
+        found.append(existing_id)
+        return existing_id is not None
+
+    response = _send_with_retry(
+        session, tokens, "POST",
+        f"{organization_url}/{project}/_apis/wit/workitems/${work_item_type}?api-version=7.0",
+        already_applied=created_despite_error,
+        json=build_row_patch_document(row, import_key),
+        headers={"Content-Type": "application/json-patch+json"}
+    )
+    work_item_id = found[-1] if response is None else response.json()["id"]
+    checkpoint.mark_created(import_key, row_number, work_item_id)
+    return work_item_id
+
+def iter_bulk_create(path, organization_url, project, work_item_type="Task", access_token=None,
+                     checkpoint_path=None, max_concurrency=DEFAULT_BULK_CONCURRENCY):
+    """Create a work item per input row, yielding progress lines; rerun with the same file to resume"""
+    access_token = access_token or authenticate_azure_cli_powershell()
+    if not access_token:
+        yield "Authentication failed: run 'az login' and try again.\n"
+        return
+
+    checkpoint = ImportCheckpoint(checkpoint_path or f"{path}.checkpoint.jsonl")
+    if checkpoint.created or checkpoint.pending:
+        yield (f"Resuming from {checkpoint.path}: {len(checkpoint.created)} row(s) already created, "
+               f"{len(checkpoint.pending)} to verify.\n")
+
+    tokens = _TokenHolder(access_token)
+    session = requests.Session()
+    max_in_flight = max(1, max_concurrency) * 2
+    created, skipped, failures = 0, 0, []
+    in_flight = {}
+    next_report = 100
+
+    def collect(done):
+        nonlocal created
+        for future in done:
+            row_number = in_flight.pop(future)
+            try:
+                future.result()
+                created += 1
+            except (requests.exceptions.RequestException, KeyError, ValueError) as e:
+                # One bad row (or an unexpected response body) must not stop the run
+                failures.append((row_number, f"{type(e).__name__}: {e}"))
+
+    with ThreadPoolExecutor(max_workers=max(1, max_concurrency)) as executor:
+        try:
+            for row_number, row in iter_import_rows(path):
+                import_key = row_import_key(row_number, row)
+                if import_key in checkpoint.created:
+                    skipped += 1
+                    continue
+                # Bounded look-ahead keeps memory flat however large the file is
+                if len(in_flight) >= max_in_flight:
+                    done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                    collect(done)
+                    if created + len(failures) >= next_report:
+                        next_report += 100
+                        yield f"Progress: {created} created, {skipped} skipped, {len(failures)} failed\n"
+                future = executor.submit(_create_row, session, tokens, checkpoint, organization_url, project,
+                                         work_item_type, row_number, row, import_key)
+                in_flight[future] = row_number
+            collect(wait(in_flight).done)
+        finally:
+            # Stopped early: rows not yet started are left for the next run
+            for future in in_flight:
+                future.cancel()
+            session.close()
+            checkpoint.close()
+
+    yield f"Created {created} work item(s), skipped {skipped} already imported, {len(failures)} failed.\n"
+    for row_number, error in failures[:10]:
+        yield f"  Row {row_number}: {error}\n"
+    if failures:
+        yield f"Rerun with the same file to retry the failed rows (checkpoint: {checkpoint.path}).\n"
+
 def main():
     """Main function to authenticate and create work item using PowerShell Azure CLI"""
-    
-    # Configuration - you can modify these values
-    organization_url = "https://dev.azure.com/tr-tax"  # Replace with your organization URL
-    project = "TaxProf"  # Replace with your project name
-    work_item_type = "Bug"  # Can be Bug, Task, User Story, etc.
+    parser = argparse.ArgumentParser(description="Create Azure DevOps work items using PowerShell Azure CLI authentication")
+    parser.add_argument("--bulk", metavar="FILE", help="CSV, JSONL or JSON array file with one work item per row (Title, Description, ... columns)")
+    parser.add_argument("--org", default=None, help="Organization name from AdoOrganizations.json (default: the one owning --project)")
+    parser.add_argument("--project", default=None, help="Project to create the work items in (default: the organization's default project)")
+    parser.add_argument("--type", default=None, help="Work item type (single mode: Bug, bulk mode default: Task)")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_BULK_CONCURRENCY, help="Work items created at the same time in bulk mode")
+    parser.add_argument("--checkpoint", default=None, help="Checkpoint file for resuming (default: <FILE>.checkpoint.jsonl)")
+    args = parser.parse_args()
+
+    # Configuration - organizations and projects come from AdoOrganizations.json (or .env)
+    from OrgRegistry import get_org_registry
+    registry = get_org_registry()
+    organization = registry.get(args.org) if args.org else registry.for_project(args.project)
+    if organization is None:
+        print(f"Unknown organization '{args.org}'. Known: {', '.join(org.name for org in registry.organizations.values())}")
+        return
+    organization_url = organization.url
+    project = args.project or organization.default_project
+    work_item_type = args.type or ("Task" if args.bulk else "Bug")  # Can be Bug, Task, User Story, etc.
     title = "Sample Bug Created via PowerShell Azure CLI Auth"
     description = "This is a test work item created using PowerShell Azure CLI authentication and Azure DevOps API"
     
@@ -168,11 +457,24 @@ def main():
     # Verify Azure CLI is installed
     if not verify_azure_cli_installation():
         return
+
+    # Authenticate once; both methods and every bulk row reuse the token
+    access_token = authenticate_azure_cli_powershell()
+    if not access_token:
+        print_login_help()
+        return
+
+    if args.bulk:
+        print(f"\nBulk mode: creating work items from {args.bulk}...")
+        for line in iter_bulk_create(args.bulk, organization_url, project, work_item_type, access_token,
+                                     args.checkpoint, args.concurrency):
+            print(line, end="")
+        return
     
     # Method 1: Try using Azure DevOps Python client with PowerShell Azure CLI authentication
     print("\nMethod 1: Attempting to create work item using Azure DevOps client with PowerShell auth...")
     work_item = create_work_item_with_powershell_auth(
-        organization_url, project, work_item_type, title, description
+        organization_url, project, work_item_type, title, description, access_token
     )
     
     if work_item:
@@ -183,20 +485,8 @@ def main():
         print(f"  URL: {work_item.url}")
         return
     
-    # Method 2: Fallback to REST API with PowerShell Azure CLI token
+    # Method 2: Fallback to REST API with the same PowerShell Azure CLI token
     print("\nMethod 2: Attempting to create work item using REST API with PowerShell Azure CLI token...")
-    access_token = authenticate_azure_cli_powershell()
-    
-    if not access_token:
-        print("Failed to authenticate with Azure CLI via PowerShell")
-        print("\nTo resolve this issue:")
-        print("1. Open PowerShell as Administrator")
-        print("2. Run: az login")
-        print("3. Complete the authentication process")
-        print("4. Run this script again")
-        return
-    
-    print("Successfully authenticated with Azure CLI via PowerShell")
     
     # Create work item using REST API
     work_item_response = create_work_item_with_rest_api(
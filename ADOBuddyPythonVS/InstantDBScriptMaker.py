@@ -6,6 +6,9 @@ import subprocess
 from azure.devops.connection import Connection
 from azure.devops.v7_0.work_item_tracking.models import JsonPatchOperation
 from msrest.authentication import BasicAuthentication
+from AdoMetadataCache import get_area_paths, get_work_item_types
+
+DEFAULT_AREA_PATH = "TaxProf\\surePrep\\surePrep-dbe-phoenix-1"
 
 def load_team_data():
     """Load team data from TeamNameAndManager.json"""
@@ -70,6 +73,11 @@ def authenticate_with_pat():
 
 def authenticate_azure_cli_powershell():
     """Authenticate using Azure CLI via PowerShell and return access token"""
+    # Concurrent callers (in any module) share one in-flight Azure CLI token fetch
+    from AdoAuth import token_flight, AZURE_DEVOPS_RESOURCE
+    return token_flight.do(AZURE_DEVOPS_RESOURCE, _authenticate_azure_cli_powershell)
+
+def _authenticate_azure_cli_powershell():
     try:
         print("Checking Azure CLI login status via PowerShell...")
         
@@ -165,7 +173,7 @@ def create_work_item_with_rest_api(organization_url, project, work_item_type, ti
     except Exception as e:
         return None, f"Error creating work item with REST API: {e}"
 
-def create_work_item_with_python_client(organization_url, project, work_item_type, title, description, assignee=None, auth_token=None, use_pat=False):
+def create_work_item_with_python_client(organization_url, project, work_item_type, title, description, assignee=None, auth_token=None, use_pat=False, area_path=DEFAULT_AREA_PATH):
     """Create work item using Azure DevOps Python client"""
     try:
         if use_pat:
@@ -198,11 +206,6 @@ def create_work_item_with_python_client(organization_url, project, work_item_typ
                 path="/fields/System.State",
                 value="New"
             ),
-            JsonPatchOperation(
-                op="add",
-                path="/fields/System.AreaPath",
-                value="TaxProf\\surePrep\\surePrep-dbe-phoenix-1"
-            ),
             JsonPatchOperation(
                 op="add",
                 path="/fields/System.Tags",
@@ -210,6 +213,16 @@ def create_work_item_with_python_client(organization_url, project, work_item_typ
             )
         ]
 
+        # Without an area path ADO files the item under the project's default area
+        if area_path:
+            patch_document.append(
+                JsonPatchOperation(
+                    op="add",
+                    path="/fields/System.AreaPath",
+                    value=area_path
+                )
+            )
+
         # Add assignee if provided
         if assignee:
             patch_document.append(
@@ -232,7 +245,30 @@ def create_work_item_with_python_client(organization_url, project, work_item_typ
     except Exception as e:
         return None, f"Error creating work item with Python client: {e}"
 
-def create_work_item_with_multiple_auth_methods(organization_url, project, work_item_type, title, description, assignee=None):
+def validate_work_item_metadata(organization_url, project, work_item_type, auth_token, use_pat=False, area_path=DEFAULT_AREA_PATH):
+    """Check work item type and area path against the cached project metadata before creating.
+
+    Cached lists are used even when stale, so only the first creation for a project goes
+    to the server; a new type or area path shows up once the cache is refreshed or invalidated.
+    """
+    from AdoAuth import build_ado_headers
+    headers = build_ado_headers(auth_token, use_pat)
+
+    work_item_types, message = get_work_item_types(organization_url, project, headers, revalidate=False)
+    # Azure DevOps matches work item type names case-insensitively
+    if work_item_types is not None and work_item_type.lower() not in (name.lower() for name in work_item_types):
+        return False, f"Work item type '{work_item_type}' does not exist in {project}. Available types: {', '.join(work_item_types)}"
+
+    if area_path:
+        area_paths, message = get_area_paths(organization_url, project, headers, revalidate=False)
+        if area_paths is not None and area_path.lower() not in (path.lower() for path in area_paths):
+            # Only the Python client sets the area path, so this is a warning rather than a failure
+            print(f"Warning: area path '{area_path}' does not exist in {project}")
+
+    # Metadata lookups that fail (e.g. missing permissions) should not block creation
+    return True, "Success"
+
+def create_work_item_with_multiple_auth_methods(organization_url, project, work_item_type, title, description, assignee=None, area_path=DEFAULT_AREA_PATH):
     """Try multiple authentication methods to create work item"""
     try:
         # Method 1: Try PAT authentication first (more reliable)
@@ -240,6 +276,9 @@ def create_work_item_with_multiple_auth_methods(organization_url, project, work_
         pat_token, pat_message = authenticate_with_pat()
         if pat_token:
             print("PAT authentication successful, trying to create work item...")
+            valid, validation_message = validate_work_item_metadata(organization_url, project, work_item_type, pat_token, use_pat=True, area_path=area_path)
+            if not valid:
+                return None, validation_message
             
             # Try REST API with PAT
             work_item, message = create_work_item_with_rest_api(
@@ -250,7 +289,7 @@ def create_work_item_with_multiple_auth_methods(organization_url, project, work_
             
             # Try Python client with PAT
             work_item, message = create_work_item_with_python_client(
-                organization_url, project, work_item_type, title, description, assignee, pat_token, use_pat=True
+                organization_url, project, work_item_type, title, description, assignee, pat_token, use_pat=True, area_path=area_path
             )
             if work_item:
                 return work_item, "Success with PAT (Python client)"
@@ -262,6 +301,9 @@ def create_work_item_with_multiple_auth_methods(organization_url, project, work_
         cli_token, cli_message = authenticate_azure_cli_powershell()
         if cli_token:
             print("Azure CLI authentication successful, trying to create work item...")
+            valid, validation_message = validate_work_item_metadata(organization_url, project, work_item_type, cli_token, use_pat=False, area_path=area_path)
+            if not valid:
+                return None, validation_message
             
             # Try REST API with Azure CLI token
             work_item, message = create_work_item_with_rest_api(
@@ -272,7 +314,7 @@ def create_work_item_with_multiple_auth_methods(organization_url, project, work_
             
             # Try Python client with Azure CLI token
             work_item, message = create_work_item_with_python_client(
-                organization_url, project, work_item_type, title, description, assignee, cli_token, use_pat=False
+                organization_url, project, work_item_type, title, description, assignee, cli_token, use_pat=False, area_path=area_path
             )
             if work_item:
                 return work_item, "Success with Azure CLI (Python client)"
@@ -325,16 +367,19 @@ def process_db_script(script_content, selected_manager, create_task=False):
         result += "Creating Azure DevOps Task...\n"
         result += "-" * 40 + "\n"
         
-        # Configuration for Azure DevOps
-        organization_url = "https://dev.azure.com/tr-tax"
-        project = "TaxProf"
+        # Configuration for Azure DevOps comes from the organization registry
+        from OrgRegistry import get_org_registry
+        organization = get_org_registry().default
+        organization_url = organization.url
+        project = organization.default_project
         work_item_type = "Task"
         title = f"DB Script Task - {selected_team} Team"
         description = script_content
         assignee = selected_manager
         
         work_item, message = create_work_item_with_multiple_auth_methods(
-            organization_url, project, work_item_type, title, description, assignee
+            organization_url, project, work_item_type, title, description, assignee,
+            organization.area_path
         )
         
         if work_item:
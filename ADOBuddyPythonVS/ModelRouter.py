@@ -0,0 +1,192 @@
+import os
+import time
+import threading
+import openai
+from langchain_core.callbacks import BaseCallbackHandler
+from InstantDBScriptMaker import load_env_config
+
+# Latency-aware routing across several Azure OpenAI deployments. Each deployment has
+# a tier (fast or large); queries are routed to a tier by their budget class, and
+# within a tier to the deployment with the lowest measured latency (EWMA). Throttled
+# deployments (HTTP 429) cool down for their Retry-After time, saturated ones (too
+# many calls in flight) are used last, and the remaining deployments are chained as
+# fallbacks so a run fails over instead of failing.
+#
+#   ADOBUDDY_DEPLOYMENTS=gpt-4o-mini:fast,gpt-4o:large
+#   ADOBUDDY_DEPLOYMENT_MAX_IN_FLIGHT=8
+ROUTE_TIERS = {"lookup": "fast", "update": "fast", "analysis": "large"}
+EWMA_ALPHA = 0.3
+DEFAULT_THROTTLE_SECONDS = 10.0
+# Errors that mean "try another deployment"; bad requests would fail everywhere
+FAILOVER_ERRORS = (openai.RateLimitError, openai.APITimeoutError, openai.APIConnectionError, openai.InternalServerError)
+
+def _setting(name, default=None):
+    return os.environ.get(name) or load_env_config().get(name, default)
+
+def parse_deployments(value, default_deployment=None):
+    """Parse "name:tier,name:tier" into [(name, tier)]; falls back to the single default deployment"""
+    deployments = []
+    for item in (value or "").split(","):
+        item = item.strip()
+        if not item:
+            continue
+        name, _, tier = item.partition(":")
+        deployments.append((name.strip(), (tier.strip() or "large").lower()))
+    if not deployments and default_deployment:
+        deployments.append((default_deployment, "large"))
+    return deployments
+
+class DeploymentState:
+    """Measured latency, throttling and in-flight calls of one deployment"""
+
+    def __init__(self, name, tier):
+        self.name = name
+        self.tier = tier
+        self.latency_ewma = None
+        self.in_flight = 0
+        self.calls = 0
+        self.errors = 0
+        self.throttled = 0
+        self.throttled_until = 0.0
+
+    def is_throttled(self, now=None):
+        return (now or time.monotonic()) < self.throttled_until
+
+class RoutingCallback(BaseCallbackHandler):
+    """Feeds call latency and throttling of one deployment back into the router"""
+
+    def __init__(self, router, name):
+        self.router = router
+        self.name = name
+        self._started = {}
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+        self._started[run_id] = time.monotonic()
+        self.router.call_started(self.name)
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        self.on_llm_start(serialized, [], run_id=run_id, **kwargs)
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        started = self._started.pop(run_id, None)
+        self.router.call_finished(self.name, time.monotonic() - started if started else None)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._started.pop(run_id, None)
+        self.router.call_failed(self.name, error)
+
+class ModelRouter:
+    """Chooses the deployment order for a query from its class and live measurements"""
+
+    def __init__(self, deployments, max_in_flight=8, adaptive=True):
+        self.deployments = {name: DeploymentState(name, tier) for name, tier in deployments}
+        self.max_in_flight = max(1, max_in_flight)
+        self.adaptive = adaptive
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, default_deployment=None, adaptive=True):
+        deployments = parse_deployments(_setting("ADOBUDDY_DEPLOYMENTS"), default_deployment)
+        if not deployments:
+            raise ValueError("No Azure OpenAI deployment configured (set ADOBUDDY_DEPLOYMENTS)")
+        return cls(deployments, int(_setting("ADOBUDDY_DEPLOYMENT_MAX_IN_FLIGHT", "8")), adaptive)
+
+    def route(self, query_class, adaptive=None):
+        """Deployment names in the order to try them: preferred tier first, then the others.
+
+        adaptive overrides the router's default for this call only (the traffic mode can
+        change between queries while the router is shared).
+        """
+        tier = ROUTE_TIERS.get(query_class, "large")
+        states = list(self.deployments.values())
+        if not (self.adaptive if adaptive is None else adaptive):
+            # Static order (configuration order) keeps record/replay deterministic
+            return [state.name for state in sorted(states, key=lambda state: state.tier != tier)]
+
+        now = time.monotonic()
+        with self._lock:
+            def score(state):
+                unavailable = state.is_throttled(now) or state.in_flight >= self.max_in_flight
+                # Unmeasured deployments sort first within their group so they get measured
+                return (unavailable, state.tier != tier, state.latency_ewma or 0.0)
+            return [state.name for state in sorted(states, key=score)]
+
+    def callback_for(self, name):
+        return RoutingCallback(self, name)
+
+    def call_started(self, name):
+        with self._lock:
+            state = self.deployments[name]
+            state.in_flight += 1
+            state.calls += 1
+
+    def call_finished(self, name, seconds):
+        with self._lock:
+            state = self.deployments[name]
+            state.in_flight = max(0, state.in_flight - 1)
+            if seconds is not None:
+                state.latency_ewma = seconds if state.latency_ewma is None else (
+                    EWMA_ALPHA * seconds + (1 - EWMA_ALPHA) * state.latency_ewma)
+
+    def call_failed(self, name, error):
+        with self._lock:
+            state = self.deployments[name]
+            state.in_flight = max(0, state.in_flight - 1)
+            state.errors += 1
+            if isinstance(error, openai.RateLimitError):
+                state.throttled += 1
+                state.throttled_until = time.monotonic() + _retry_after_seconds(error)
+
+    def stats(self):
+        with self._lock:
+            return {
+                state.name: {
+                    "tier": state.tier,
+                    "latency_ewma": round(state.latency_ewma, 3) if state.latency_ewma is not None else None,
+                    "in_flight": state.in_flight,
+                    "calls": state.calls,
+                    "errors": state.errors,
+                    "throttled": state.throttled,
+                }
+                for state in self.deployments.values()
+            }
+
+def _retry_after_seconds(error):
+    """Cooldown from the Retry-After header of a throttled response, when present"""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    for header in ("retry-after-ms", "retry-after"):
+        value = headers.get(header)
+        if value:
+            try:
+                seconds = float(value)
+                return seconds / 1000 if header.endswith("-ms") else seconds
+            except ValueError:
+                pass
+    return DEFAULT_THROTTLE_SECONDS
+
+def build_routed_llm(router, order, make_llm):
+    """Chat model for the first deployment in order, failing over to the rest on errors.
+
+    make_llm(name, callback, max_retries) must return a chat model for the deployment that
+    reports to callback. Only the last deployment retries; the others fail over right away.
+    """
+    models = [make_llm(name, router.callback_for(name), 0 if index < len(order) - 1 else 2)
+              for index, name in enumerate(order)]
+    if len(models) == 1:
+        return models[0]
+    return models[0].with_fallbacks(models[1:], exceptions_to_handle=FAILOVER_ERRORS)
+
+_router = None
+_router_lock = threading.Lock()
+
+def get_model_router(default_deployment=None, adaptive=True):
+    """Process-wide router, so latency measurements carry over between queries.
+
+    The arguments only apply when the router is created; pass adaptive to route() per query.
+    """
+    global _router
+    with _router_lock:
+        if _router is None:
+            _router = ModelRouter.from_env(default_deployment, adaptive)
+        return _router
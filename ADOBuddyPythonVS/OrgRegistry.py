@@ -0,0 +1,211 @@
+import os
+import re
+import json
+import time
+import asyncio
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from InstantDBScriptMaker import DEFAULT_AREA_PATH, load_env_config, authenticate_azure_cli_powershell
+from AdoAuth import DEFAULT_PROJECT, AZURE_DEVOPS_RESOURCE, get_organization_url, build_ado_headers, token_flight
+
+# Registry of the Azure DevOps organizations this deployment serves. Each organization
+# has its own MCP session pool, token cache and HTTP connection pool, so queries for
+# one org never queue behind another's. Queries are routed by the project (or org)
+# they mention. Without AdoOrganizations.json the registry holds the single org from
+# ADO_ORGANIZATION_URL, which is the previous behaviour.
+#
+#   ADOBUDDY_ORGS_CONFIG=<path>   (default AdoOrganizations.json next to this file)
+script_dir = os.path.dirname(os.path.abspath(__file__))
+ORGS_CONFIG_PATH = os.path.join(script_dir, "AdoOrganizations.json")
+
+CLI_TOKEN_SECONDS = 45 * 60  # Azure CLI tokens live about an hour
+HTTP_POOL_SIZE = 16
+
+class AdoOrganization:
+    """One organization: its URL, projects and per-org clients"""
+
+    def __init__(self, name, url, projects=None, default_project=None, pat_env="ADO_PAT",
+                 area_path=None, mcp_server=None):
+        self.name = name
+        self.url = url.rstrip('/')
+        self.projects = list(projects or [])
+        self.default_project = default_project or (self.projects[0] if self.projects else DEFAULT_PROJECT)
+        self.pat_env = pat_env
+        self.area_path = area_path
+        self.mcp_server = mcp_server
+        self._token = None
+        self._token_expires_at = 0.0
+        self._token_lock = threading.Lock()
+        self._http = None
+        self._session_pool = None
+        self._session_pool_lock = None
+
+    @classmethod
+    def from_dict(cls, item):
+        url = item.get("url") or f"https://dev.azure.com/{item['name']}"
+        return cls(
+            item.get("name") or url.rstrip('/').rsplit('/', 1)[-1],
+            url,
+            item.get("projects"),
+            item.get("default_project"),
+            item.get("pat_env", "ADO_PAT"),
+            item.get("area_path"),
+            item.get("mcp_server"),
+        )
+
+    def mcp_config(self):
+        """MCP configuration for this organization's Azure DevOps server"""
+        server = self.mcp_server or {"command": "npx", "args": ["-y", "@azure-devops/mcp", self.name]}
+        return {"mcpServers": {"ado": server}}
+
+    def _fetch_token(self):
+        pat = os.environ.get(self.pat_env) or load_env_config().get(self.pat_env)
+        if pat and pat != 'your-personal-access-token':
+            return pat, True, "Success with PAT", None
+
+        cli_token, cli_message = authenticate_azure_cli_powershell()
+        if cli_token:
+            return cli_token, False, "Success with Azure CLI", time.time() + CLI_TOKEN_SECONDS
+        return None, False, f"PAT authentication: no valid {self.pat_env}; Azure CLI authentication: {cli_message}", None
+
+    def get_auth_token(self):
+        """(token, use_pat, message) for this organization, cached until it is close to expiring"""
+        with self._token_lock:
+            if self._token and (self._token_expires_at is None or time.time() < self._token_expires_at):
+                return self._token
+        token, use_pat, message, expires_at = token_flight.do(f"{AZURE_DEVOPS_RESOURCE}:{self.url}", self._fetch_token)
+        if token:
+            with self._token_lock:
+                self._token = (token, use_pat, message)
+                self._token_expires_at = expires_at
+        return token, use_pat, message
+
+    def invalidate_token(self):
+        with self._token_lock:
+            self._token = None
+
+    def _on_response(self, response, *args, **kwargs):
+        # A revoked PAT or expired CLI token: the next call fetches a fresh one
+        if response.status_code == 401:
+            self.invalidate_token()
+
+    def headers(self, content_type="application/json"):
+        """Request headers for this organization, or None when authentication fails"""
+        token, use_pat, _ = self.get_auth_token()
+        return build_ado_headers(token, use_pat, content_type) if token else None
+
+    @property
+    def http(self):
+        """requests.Session with this organization's own connection pool"""
+        if self._http is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=HTTP_POOL_SIZE)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            session.hooks["response"].append(self._on_response)
+            self._http = session
+        return self._http
+
+    async def get_session_pool(self, size=None):
+        """Warm MCP session pool for this organization, started on first use"""
+        from ParallelToolDispatch import McpSessionPool, DEFAULT_TOOL_CONCURRENCY
+
+        if self._session_pool_lock is None:
+            self._session_pool_lock = asyncio.Lock()
+        async with self._session_pool_lock:
+            if self._session_pool is None:
+                self._session_pool = await McpSessionPool(self.mcp_config(), "ado", size or DEFAULT_TOOL_CONCURRENCY).start()
+        return self._session_pool
+
+    async def close_session_pool(self):
+        pool, self._session_pool = self._session_pool, None
+        if pool is not None:
+            await pool.close()
+
+    def has_project(self, project):
+        return any(known.lower() == project.lower() for known in self.projects)
+
+class OrgRegistry:
+    """Looks up the organization for a query, project or URL"""
+
+    def __init__(self, organizations, default=None):
+        if not organizations:
+            raise ValueError("At least one Azure DevOps organization must be configured")
+        self.organizations = {organization.name.lower(): organization for organization in organizations}
+        self.default = self.organizations.get((default or "").lower()) or organizations[0]
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path=None):
+        """Registry from the JSON config, or the single .env organization when there is none"""
+        path = path or os.environ.get("ADOBUDDY_ORGS_CONFIG") or load_env_config().get("ADOBUDDY_ORGS_CONFIG") or ORGS_CONFIG_PATH
+        if not os.path.exists(path):
+            organization_url = get_organization_url()
+            name = organization_url.rsplit('/', 1)[-1]
+            # The single .env organization is the TaxProf one the DB Script Maker was built for
+            return cls([AdoOrganization(name, organization_url, [DEFAULT_PROJECT], area_path=DEFAULT_AREA_PATH)])
+
+        with open(path, 'r', encoding='utf-8') as file:
+            config = json.load(file)
+        organizations = [AdoOrganization.from_dict(item) for item in config.get("organizations", [])]
+        return cls(organizations, config.get("default_organization"))
+
+    def get(self, name):
+        return self.organizations.get(name.lower())
+
+    def for_project(self, project):
+        """Organization owning a project; the default organization when no other one lists it"""
+        if project and not self.default.has_project(project):
+            for organization in self.organizations.values():
+                if organization.has_project(project):
+                    return organization
+        return self.default
+
+    def for_url(self, url=None):
+        """Organization for a URL (or the default); unknown URLs get an ad-hoc entry with the default settings"""
+        if not url:
+            return self.default
+        url = url.rstrip('/')
+        with self._lock:
+            for organization in self.organizations.values():
+                if url.lower() == organization.url.lower() or url.lower().startswith(organization.url.lower() + "/"):
+                    return organization
+            name = url.rsplit('/', 1)[-1]
+            organization = AdoOrganization(name, url)
+            # Copy on write: other threads may be iterating the current dict without the lock
+            self.organizations = dict(self.organizations, **{name.lower(): organization})
+            return organization
+
+    def resolve(self, text):
+        """Organization for a free text query: an org it names, else the org of a project it names"""
+        message = str(text or "").lower()
+        for organization in self.organizations.values():
+            if re.search(rf"(?<![\w-]){re.escape(organization.name.lower())}(?![\w-])", message):
+                return organization
+        for organization in [self.default] + [org for org in self.organizations.values() if org is not self.default]:
+            for project in organization.projects:
+                if re.search(rf"(?<![\w-]){re.escape(project.lower())}(?![\w-])", message):
+                    return organization
+        return self.default
+
+    async def close_session_pools(self):
+        for organization in self.organizations.values():
+            await organization.close_session_pool()
+
+_registry = None
+_registry_lock = threading.Lock()
+
+def get_org_registry():
+    """Process-wide registry, loaded on first use"""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = OrgRegistry.load()
+        return _registry
+
+def set_org_registry(registry):
+    """Replace the process-wide registry (e.g. with stand-in organizations for tests)"""
+    global _registry
+    with _registry_lock:
+        _registry = registry
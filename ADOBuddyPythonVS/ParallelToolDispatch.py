@@ -0,0 +1,205 @@
+import os
+import re
+import asyncio
+from anyio import BrokenResourceError, ClosedResourceError, EndOfStream
+from mcp_use import MCPClient
+from mcp_use.client.session import MCPSession
+from mcp_use.client.connectors import BaseConnector
+
+# Parallel dispatch of independent tool calls issued by the LLM in a single step.
+# The agent executor already gathers multiple tool calls of one step concurrently;
+# this spreads the read-only ones over a shared pool of MCP sessions (server
+# processes started on demand and kept warm across queries) so a step takes about
+# as long as its slowest call. Writes are serialized.
+DEFAULT_TOOL_CONCURRENCY = int(os.environ.get("ADOBUDDY_TOOL_CONCURRENCY", "3"))
+
+_READ_ONLY_PATTERN = re.compile(r"(^|_)(get|list|search|show|my)_")
+
+# Errors meaning the session's server process or stream is gone; such sessions are
+# dropped from the pool instead of being handed to the next call
+TRANSPORT_ERRORS = (ConnectionError, EOFError, BrokenResourceError, ClosedResourceError, EndOfStream)
+
+def is_read_only_tool(name):
+    """True for tools that only read data and can safely run side by side"""
+    return bool(_READ_ONLY_PATTERN.search(name + "_"))
+
+class McpSessionPool:
+    """Bounded pool of MCP sessions for one server; grows lazily up to size"""
+
+    def __init__(self, config, server_name="ado", size=DEFAULT_TOOL_CONCURRENCY):
+        self.config = config
+        self.server_name = server_name
+        self.size = max(1, size)
+        self._idle = []  # (connector, client)
+        self._clients = []
+        self._created = 0
+        self._condition = asyncio.Condition()
+        self._write_lock = asyncio.Lock()
+        # What the server offers, listed once from the first session
+        self.tools = []
+        self.resources = []
+        self.prompts = []
+
+    async def _acquire(self):
+        async with self._condition:
+            while not self._idle and self._created >= self.size:
+                await self._condition.wait()
+            if self._idle:
+                return self._idle.pop()
+            self._created += 1
+
+        try:
+            client = MCPClient.from_dict(self.config)
+            session = await client.create_session(self.server_name)
+        except BaseException:
+            async with self._condition:
+                self._created -= 1
+                self._condition.notify()
+            raise
+        self._clients.append(client)
+        connector = session.connector
+        if not self.tools:
+            self.tools = await connector.list_tools()
+            self.resources = await connector.list_resources()
+            self.prompts = await connector.list_prompts()
+        return connector, client
+
+    async def _release(self, entry):
+        async with self._condition:
+            self._idle.append(entry)
+            self._condition.notify()
+
+    async def _discard(self, entry):
+        """Drop a broken session; the next call that needs one starts a fresh server"""
+        _, client = entry
+        async with self._condition:
+            self._created -= 1
+            self._condition.notify()
+        if client in self._clients:
+            self._clients.remove(client)
+        try:
+            await client.close_all_sessions()
+        except Exception as e:
+            print(f"Error closing broken MCP session: {e}")
+
+    async def run(self, operation):
+        """Run operation(connector) on any free session, waiting when all sessions are busy"""
+        entry = await self._acquire()
+        try:
+            result = await operation(entry[0])
+        except TRANSPORT_ERRORS:
+            await self._discard(entry)
+            raise
+        except BaseException:
+            await self._release(entry)
+            raise
+        await self._release(entry)
+        return result
+
+    async def start(self):
+        """Start the first session up front so the pool is warm and its tool list is known"""
+        await self._release(await self._acquire())
+        return self
+
+    async def call_tool(self, name, arguments, read_timeout_seconds=None):
+        """Run a tool call on any free session"""
+        return await self.run(lambda connector: connector.call_tool(name, arguments, read_timeout_seconds))
+
+    async def dispatch(self, name, arguments, read_timeout_seconds=None):
+        """Read-only calls run on any free session; writes run one at a time"""
+        if is_read_only_tool(name):
+            return await self.call_tool(name, arguments, read_timeout_seconds)
+        async with self._write_lock:
+            return await self.call_tool(name, arguments, read_timeout_seconds)
+
+    @property
+    def sessions_started(self):
+        return len(self._clients)
+
+    async def close(self):
+        """Stop the extra MCP server processes started by the pool"""
+        clients, self._clients = self._clients, []
+        for client in clients:
+            try:
+                await client.close_all_sessions()
+            except Exception as e:
+                print(f"Error closing pooled MCP session: {e}")
+
+class PooledConnector(BaseConnector):
+    """Per-run connector backed by a shared, already started McpSessionPool.
+
+    Several concurrent runs (e.g. the batch runner) can each wrap their own PooledConnector
+    with validation, budgets and so on without touching the shared sessions. Each one hands
+    out its own copies of the pool's tools, so per-run hooks can sort and edit them freely.
+    Written against the BaseConnector of mcp-use 1.7 (see requirements.txt); every server
+    request goes to one of the pool's sessions.
+    """
+
+    def __init__(self, pool):
+        super().__init__()
+        self.pool = pool
+        self._tools = [tool.model_copy() for tool in pool.tools]
+        self._resources = list(pool.resources)
+        self._prompts = list(pool.prompts)
+        self._initialized = True
+        self._connected = True
+
+    @property
+    def public_identifier(self):
+        return f"pool:{self.pool.server_name}"
+
+    async def connect(self):
+        self._connected = True
+
+    async def disconnect(self):
+        # The sessions belong to the pool and outlive the run
+        self._connected = False
+
+    async def initialize(self):
+        return None
+
+    @property
+    def is_connected(self):
+        return self._connected
+
+    @property
+    def tools(self):
+        return self._tools
+
+    @property
+    def resources(self):
+        return self._resources
+
+    @property
+    def prompts(self):
+        return self._prompts
+
+    async def list_tools(self):
+        return self._tools
+
+    async def list_resources(self):
+        return self._resources
+
+    async def list_prompts(self):
+        return self._prompts
+
+    async def call_tool(self, name, arguments, read_timeout_seconds=None):
+        return await self.pool.dispatch(name, arguments, read_timeout_seconds)
+
+    async def read_resource(self, uri):
+        return await self.pool.run(lambda connector: connector.read_resource(uri))
+
+    async def get_prompt(self, name, arguments=None):
+        return await self.pool.run(lambda connector: connector.get_prompt(name, arguments))
+
+def agent_client_for(connector, server_name="ado"):
+    """MCPClient whose only session is an already connected per-run connector.
+
+    MCPAgent(connectors=[...]) in mcp-use 1.7 connects the connectors but never registers
+    their tools with the agent, so per-run connectors reach the agent through a client.
+    Closing the client only disconnects the connector.
+    """
+    client = MCPClient()
+    client.sessions[server_name] = MCPSession(connector)
+    client.active_sessions.append(server_name)
+    return client
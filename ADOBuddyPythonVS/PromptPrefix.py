@@ -0,0 +1,90 @@
+import time
+import json
+import hashlib
+from langchain_core.callbacks import BaseCallbackHandler
+
+# Azure OpenAI caches prompt prefixes (1024+ identical leading tokens) server side.
+# The agent's prefix is the system prompt plus the tool schemas, so both have to be
+# byte-identical between requests: tools are sorted by name and their schemas are
+# canonicalized (keys sorted recursively), leaving only the conversation to vary.
+
+def canonicalize_schema(value):
+    """Same JSON content with dict keys sorted at every level"""
+    if isinstance(value, dict):
+        return {key: canonicalize_schema(value[key]) for key in sorted(value)}
+    if isinstance(value, list):
+        return [canonicalize_schema(item) for item in value]
+    return value
+
+def stabilize_tool_prefix(connector, instructions=""):
+    """Sort and canonicalize the connector's tools in place; returns a hash of the static prefix.
+
+    The connector's tool list must belong to this run (PooledConnector hands out copies of
+    the shared pool's tools). Install it after every hook that edits tool schemas, so the
+    agent sees the final version.
+    """
+    tools = connector.tools
+    tools.sort(key=lambda tool: tool.name)
+    for tool in tools:
+        tool.inputSchema = canonicalize_schema(tool.inputSchema or {})
+        if tool.description:
+            tool.description = tool.description.strip()
+
+    # The agent lists tools with list_tools(), which on a live session would ask the server
+    # again and drop these edits; serve this run's final list instead
+    async def list_tools():
+        return tools
+    connector.list_tools = list_tools
+
+    prefix = json.dumps(
+        [instructions, [[tool.name, tool.description, tool.inputSchema] for tool in tools]],
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(prefix.encode("utf-8")).hexdigest()[:12]
+
+class PromptCacheMetrics(BaseCallbackHandler):
+    """Collects cached prompt tokens and time to first token for the LLM calls of one run"""
+
+    def __init__(self):
+        self.prompt_tokens = 0
+        self.cached_tokens = 0
+        self.first_token_seconds = []
+        self._started = {}
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        self._started[run_id] = time.monotonic()
+
+    def on_llm_new_token(self, token, *, run_id, **kwargs):
+        started = self._started.pop(run_id, None)
+        if started is not None:
+            self.first_token_seconds.append(time.monotonic() - started)
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        started = self._started.pop(run_id, None)
+        if started is not None:
+            # Without streaming the first token arrives with the whole response
+            self.first_token_seconds.append(time.monotonic() - started)
+
+        usage = (response.llm_output or {}).get("token_usage") or {}
+        prompt_tokens = usage.get("prompt_tokens")
+        cached_tokens = (usage.get("prompt_tokens_details") or {}).get("cached_tokens")
+        if prompt_tokens is None:
+            # Streaming responses report usage on the message instead
+            for generations in response.generations:
+                for generation in generations:
+                    metadata = getattr(getattr(generation, "message", None), "usage_metadata", None) or {}
+                    prompt_tokens = (prompt_tokens or 0) + metadata.get("input_tokens", 0)
+                    cached_tokens = (cached_tokens or 0) + (metadata.get("input_token_details") or {}).get("cache_read", 0)
+        self.prompt_tokens += prompt_tokens or 0
+        self.cached_tokens += cached_tokens or 0
+
+    def summary(self):
+        ttft = self.first_token_seconds
+        return {
+            "llm_calls": len(ttft),
+            "prompt_tokens": self.prompt_tokens,
+            "cached_tokens": self.cached_tokens,
+            "cached_ratio": round(self.cached_tokens / self.prompt_tokens, 3) if self.prompt_tokens else 0.0,
+            "first_ttft_seconds": round(ttft[0], 3) if ttft else None,
+            "avg_ttft_seconds": round(sum(ttft) / len(ttft), 3) if ttft else None,
+        }
@@ -0,0 +1,246 @@
+"""
+Receiver for Azure DevOps service hooks (Web Hooks consumer).
+
+Work item, build, release and pull request events invalidate or patch the matching
+local caches as soon as ADO reports a change, so those caches can keep long TTLs:
+the work item index is patched in place, cached tool results of the affected
+organization and project (or work item) are dropped, and cached metadata is dropped
+on an adobuddy.metadata.changed event.
+
+    python ServiceHookReceiver.py serve
+    python ServiceHookReceiver.py post-sample workitem.updated
+
+Configure the subscription in ADO with the URL http://<host>:7882/service-hooks and
+either basic authentication (any user name, ADOBUDDY_WEBHOOK_SECRET as password) or
+an "X-ADOBuddy-Secret: <secret>" HTTP header. Without a secret only loopback
+clients are accepted.
+"""
+
+import os
+import sys
+import hmac
+import json
+import base64
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import requests
+from InstantDBScriptMaker import load_env_config
+from WorkItemIndex import apply_work_item_event
+from AdoMetadataCache import invalidate_metadata
+from ToolResultShaper import invalidate_results
+from AgentWorkerPool import forward_invalidation
+from OrgRegistry import get_org_registry
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+SAMPLES_DIR = os.path.join(script_dir, "ServiceHookSamples")
+DEFAULT_HOST = "127.0.0.3"
+DEFAULT_PORT = 7882
+HOOK_PATH = "/service-hooks"
+MAX_BODY_BYTES = 1024 * 1024
+
+# Tool result caches dropped per event type
+_WORK_ITEM_TOOLS = ("wit_", "search_workitem", "work_")
+EVENT_TOOL_PREFIXES = {
+    "workitem.created": _WORK_ITEM_TOOLS,
+    "workitem.updated": _WORK_ITEM_TOOLS,
+    "workitem.deleted": _WORK_ITEM_TOOLS,
+    "workitem.restored": _WORK_ITEM_TOOLS,
+    "workitem.commented": _WORK_ITEM_TOOLS,
+    "build.complete": ("build_", "pipelines_"),
+    "ms.vss-pipelines.run-state-changed-event": ("build_", "pipelines_"),
+    "ms.vss-pipelines.stage-state-changed-event": ("build_", "pipelines_"),
+    "ms.vss-release.deployment-completed-event": ("release_",),
+    "ms.vss-release.release-created-event": ("release_",),
+    "git.push": ("repo_",),
+    "git.pullrequest.created": ("repo_",),
+    "git.pullrequest.updated": ("repo_",),
+    "git.pullrequest.merged": ("repo_",),
+}
+
+# ADO has no service hook events for teams, iterations or areas; scripts that change
+# them can post this event ({"resource": {"project": "<name>"}}) to refresh metadata
+METADATA_CHANGED_EVENT = "adobuddy.metadata.changed"
+
+hook_stats = {"received": 0, "rejected": 0, "index_patched": 0, "results_dropped": 0}
+_stats_lock = threading.Lock()
+
+def _setting(name, default=None):
+    return os.environ.get(name) or load_env_config().get(name, default)
+
+def _event_organization_url(event):
+    """Organization of an event: the account base URL, else the part of the resource URL before /_apis/"""
+    account = (event.get("resourceContainers") or {}).get("account") or {}
+    if account.get("baseUrl"):
+        return account["baseUrl"]
+    url = (event.get("resource") or {}).get("url") or ""
+    return url.split("/_apis/", 1)[0] if "/_apis/" in url else None
+
+def _event_work_item(resource):
+    """Full work item payload of a work item event (updated events nest it under revision)"""
+    work_item = dict(resource.get("revision") or resource)
+    work_item["id"] = resource.get("workItemId") or work_item.get("id")
+    return work_item
+
+def _event_project(resource, work_item=None):
+    """Project name of an event, where the payload carries one"""
+    project = ((work_item or {}).get("fields") or {}).get("System.TeamProject")
+    return (project
+            or (resource.get("project") or {}).get("name")
+            or ((resource.get("repository") or {}).get("project") or {}).get("name"))
+
+def handle_event(event):
+    """Apply one service hook event to the local caches; returns a list of the actions taken"""
+    event_type = event.get("eventType", "")
+    resource = event.get("resource") or {}
+    organization_url = _event_organization_url(event)
+    work_item = _event_work_item(resource) if event_type.startswith("workitem.") else None
+    actions = []
+
+    if work_item is not None:
+        if apply_work_item_event(work_item, deleted=event_type == "workitem.deleted",
+                                 organization_url=organization_url):
+            actions.append(f"index patched for #{work_item['id']}")
+            with _stats_lock:
+                hook_stats["index_patched"] += 1
+
+    prefixes = EVENT_TOOL_PREFIXES.get(event_type)
+    if prefixes:
+        # Cached results are scoped by organization name; of those, only the ones that
+        # may include the changed project or work item are dropped
+        invalidation = {
+            "tool_prefixes": prefixes,
+            "scope": get_org_registry().for_url(organization_url).name,
+            "project": _event_project(resource, work_item),
+            "work_item_id": work_item["id"] if work_item is not None else None,
+        }
+        # In process execution mode the cached results live in the agent workers
+        forward_invalidation("results", invalidation)
+        dropped = invalidate_results(**invalidation)
+        if dropped:
+            actions.append(f"{dropped} cached tool result(s) dropped")
+            with _stats_lock:
+                hook_stats["results_dropped"] += dropped
+
+    if event_type == METADATA_CHANGED_EVENT:
+        project = resource.get("project")
+        invalidate_metadata(project)
+        forward_invalidation("metadata", project)
+        actions.append(f"metadata invalidated for {project or 'all projects'}")
+
+    return actions
+
+def _is_authorized(handler, secret):
+    """Shared secret via basic auth password or X-ADOBuddy-Secret; loopback only when no secret is set"""
+    if not secret:
+        return handler.client_address[0].startswith("127.") or handler.client_address[0] == "::1"
+
+    supplied = handler.headers.get("X-ADOBuddy-Secret", "")
+    authorization = handler.headers.get("Authorization", "")
+    if authorization.startswith("Basic "):
+        try:
+            supplied = base64.b64decode(authorization[6:]).decode("utf-8").split(":", 1)[1]
+        except (ValueError, IndexError):
+            supplied = ""
+    return hmac.compare_digest(supplied.encode("utf-8"), secret.encode("utf-8"))
+
+class ServiceHookHandler(BaseHTTPRequestHandler):
+    secret = None
+
+    def do_POST(self):
+        if self.path.split("?", 1)[0] != HOOK_PATH:
+            self._respond(404, {"error": "not found"})
+            return
+        if not _is_authorized(self, self.secret):
+            with _stats_lock:
+                hook_stats["rejected"] += 1
+            self._respond(401, {"error": "unauthorized"})
+            return
+
+        length = int(self.headers.get("Content-Length", 0))
+        if length > MAX_BODY_BYTES:
+            self._respond(413, {"error": "payload too large"})
+            return
+        try:
+            event = json.loads(self.rfile.read(length) or b"{}")
+        except json.JSONDecodeError:
+            self._respond(400, {"error": "invalid JSON"})
+            return
+
+        with _stats_lock:
+            hook_stats["received"] += 1
+        try:
+            actions = handle_event(event)
+        except Exception as e:
+            print(f"Service hook {event.get('eventType')} failed: {e}")
+            self._respond(500, {"error": str(e)})
+            return
+        self._respond(200, {"eventType": event.get("eventType"), "actions": actions})
+
+    def do_GET(self):
+        # Health check / stats for whoever sets up the subscription
+        self._respond(200, dict(hook_stats))
+
+    def _respond(self, status, body):
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+def start_service_hook_receiver(host=None, port=None, secret=None):
+    """Serve service hooks on a daemon thread; returns the server, or None if the port is taken"""
+    host = host or _setting("ADOBUDDY_WEBHOOK_HOST", DEFAULT_HOST)
+    port = int(port if port is not None else _setting("ADOBUDDY_WEBHOOK_PORT", DEFAULT_PORT))
+    handler = type("ConfiguredServiceHookHandler", (ServiceHookHandler,),
+                   {"secret": secret if secret is not None else _setting("ADOBUDDY_WEBHOOK_SECRET")})
+    try:
+        server = ThreadingHTTPServer((host, port), handler)
+    except OSError as e:
+        print(f"Service hook receiver not started on {host}:{port}: {e}")
+        return None
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"Service hook receiver listening on http://{host}:{port}{HOOK_PATH}")
+    return server
+
+def post_sample(name, url=None, secret=None):
+    """Post a payload from ServiceHookSamples to a running receiver; returns the response"""
+    path = name if os.path.exists(name) else os.path.join(SAMPLES_DIR, f"{name}.json")
+    with open(path, 'r', encoding='utf-8') as file:
+        event = json.load(file)
+    url = url or f"http://{_setting('ADOBUDDY_WEBHOOK_HOST', DEFAULT_HOST)}:{_setting('ADOBUDDY_WEBHOOK_PORT', DEFAULT_PORT)}{HOOK_PATH}"
+    secret = secret if secret is not None else _setting("ADOBUDDY_WEBHOOK_SECRET")
+    headers = {"X-ADOBuddy-Secret": secret} if secret else {}
+    return requests.post(url, json=event, headers=headers, timeout=10)
+
+def main():
+    parser = argparse.ArgumentParser(description="Azure DevOps service hook receiver for ADOBuddy caches")
+    commands = parser.add_subparsers(dest="command", required=True)
+    serve = commands.add_parser("serve", help="Run the receiver in the foreground")
+    serve.add_argument("--host", default=None)
+    serve.add_argument("--port", type=int, default=None)
+    sample = commands.add_parser("post-sample", help="Post a sample payload to a running receiver")
+    sample.add_argument("name", help="Sample name (e.g. workitem.updated) or path to a JSON payload")
+    sample.add_argument("--url", default=None)
+    args = parser.parse_args()
+
+    if args.command == "post-sample":
+        response = post_sample(args.name, args.url)
+        print(f"HTTP {response.status_code}: {response.text}")
+        sys.exit(0 if response.ok else 1)
+
+    server = start_service_hook_receiver(args.host, args.port)
+    if server is None:
+        sys.exit(1)
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
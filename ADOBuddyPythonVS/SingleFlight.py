@@ -0,0 +1,98 @@
+import json
+import asyncio
+import threading
+
+# Single-flight deduplication: while a call for a key is in flight, identical calls
+# wait for it and share its result instead of starting their own. Used for Azure CLI
+# token fetches (one PowerShell subprocess per burst instead of one per user) and for
+# identical read-only MCP tool calls issued by concurrent chat sessions.
+
+class _Call:
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+class SingleFlight:
+    """Thread based single-flight group for blocking calls"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.executed = 0
+        self.shared = 0
+
+    def do(self, key, fn, *args, **kwargs):
+        """Run fn once per key at a time; concurrent callers with the same key get the same result"""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.executed += 1
+            else:
+                self.shared += 1
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn(*args, **kwargs)
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+        return call.result
+
+class AsyncSingleFlight:
+    """Single-flight group for coroutines running on one event loop"""
+
+    def __init__(self):
+        self._tasks = {}
+        self.executed = 0
+        self.shared = 0
+
+    async def do(self, key, coroutine_fn, *args, **kwargs):
+        while True:
+            task = self._tasks.get(key)
+            if task is None:
+                self.executed += 1
+                task = asyncio.ensure_future(coroutine_fn(*args, **kwargs))
+                self._tasks[key] = task
+                task.add_done_callback(lambda done, key=key: self._tasks.pop(key, None) if self._tasks.get(key) is done else None)
+            else:
+                self.shared += 1
+            try:
+                # Shielded so one caller being cancelled does not cancel the call for the others
+                return await asyncio.shield(task)
+            except asyncio.CancelledError:
+                current = asyncio.current_task()
+                if not task.cancelled() or (hasattr(current, "cancelling") and current.cancelling()):
+                    raise
+                # The shared call was cancelled (its leader's run was torn down), not this
+                # caller: issue the call again with this caller's own function
+
+# Shared by every chat session in the process
+tool_call_flight = AsyncSingleFlight()
+
+def install_tool_single_flight(connector, is_read_only_tool, scope=""):
+    """Share identical in-flight read-only tool calls across concurrent sessions.
+
+    Install it inside argument validation so keys are built from normalized arguments.
+    scope (the organization) keeps identical calls against different orgs apart.
+    """
+    original_call_tool = connector.call_tool
+
+    async def call_tool(name, arguments):
+        if not is_read_only_tool(name):
+            return await original_call_tool(name, arguments)
+        key = f"{scope}:{name}:{json.dumps(arguments, sort_keys=True, default=str)}"
+        return await tool_call_flight.do(key, original_call_tool, name, arguments)
+
+    connector.call_tool = call_tool
@@ -0,0 +1,260 @@
+"""
+Soak test for the Gradio host against local stand-ins.
+
+Runs thousands of chat turns through chatbot_response (and repeated clicks on the Instant
+DB Script Maker tool, whose server is stubbed out) with a stand-in Azure OpenAI endpoint
+and a stand-in ADO MCP server, samples RSS, open file descriptors/handles, child processes
+and thread count as it goes, and exits non-zero when any of them keeps growing after warm-up.
+
+    python SoakTest.py --turns 2000 --concurrency 4 --sample-every 50
+
+The stand-in MCP server is this file run with --mcp-server; the stand-in LLM is a small
+HTTP server speaking the chat completions API, so the real AzureChatOpenAI, mcp_use and
+httpx code paths are exercised.
+"""
+
+import os
+import re
+import gc
+import sys
+import json
+import time
+import types
+import asyncio
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import psutil
+from OrgRegistry import OrgRegistry, AdoOrganization, get_org_registry, set_org_registry
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+SAMPLES_PATH = os.path.join(script_dir, ".adobuddy", "soak_samples.jsonl")
+
+# Allowed growth between the first and last sample windows after warm-up
+GROWTH_TOLERANCES = {"rss_mb": 64, "open_files": 16, "children": 2, "threads": 4}
+
+SOAK_QUERIES = [
+    "List the builds of the TaxProf project",
+    "Show the work items in the current TaxProf iteration",
+    "Summarize the latest builds across TaxProf",
+]
+
+def run_stand_in_mcp_server():
+    """Minimal ADO MCP stand-in over stdio with a couple of large read-only tools"""
+    from mcp.server.fastmcp import FastMCP
+
+    server = FastMCP("ado-stand-in")
+
+    @server.tool()
+    def wit_my_work_items(project: str, top: int = 100) -> str:
+        """Work items assigned to the current user in a project"""
+        return json.dumps([
+            {"id": 4100000 + number, "url": f"https://dev.azure.com/stand-in/_apis/wit/workItems/{number}",
+             "fields": {"System.Title": f"Stand-in task {number}", "System.State": "Active",
+                        "System.WorkItemType": "Task", "System.TeamProject": project,
+                        "System.Description": "x" * 400}}
+            for number in range(top)
+        ])
+
+    @server.tool()
+    def build_get_builds(project: str, top: int = 50) -> str:
+        """Recent builds of a project"""
+        return json.dumps([
+            {"id": 900000 + number, "buildNumber": f"2025.1.{number}", "status": "completed",
+             "result": "succeeded", "definition": {"id": 7, "name": "Stand-in CI"}, "project": {"name": project},
+             "logs": {"url": "https://dev.azure.com/stand-in/logs"}, "triggerInfo": {"ci.message": "y" * 300}}
+            for number in range(top)
+        ])
+
+    server.run()
+
+class _StandInLLMHandler(BaseHTTPRequestHandler):
+    """Chat completions stand-in: calls the first offered tool, then answers"""
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        messages = body.get("messages", [])
+        tools = [tool["function"]["name"] for tool in body.get("tools", [])]
+        if messages and messages[-1].get("role") != "tool" and tools:
+            tool_name = "build_get_builds" if "build_get_builds" in tools else tools[0]
+            message = {"role": "assistant", "content": None, "tool_calls": [{
+                "id": f"call_{time.monotonic_ns()}", "type": "function",
+                "function": {"name": tool_name, "arguments": json.dumps({"project": "TaxProf"})}}]}
+            finish_reason = "tool_calls"
+        else:
+            message = {"role": "assistant", "content": "Stand-in answer: the requested items were listed."}
+            finish_reason = "stop"
+        usage = {"prompt_tokens": 1200, "completion_tokens": 20, "total_tokens": 1220,
+                 "prompt_tokens_details": {"cached_tokens": 1024}}
+
+        if body.get("stream"):
+            delta = dict(message)
+            for index, tool_call in enumerate(delta.get("tool_calls") or []):
+                tool_call["index"] = index
+            chunks = [
+                {"choices": [{"index": 0, "delta": delta, "finish_reason": None}]},
+                {"choices": [{"index": 0, "delta": {}, "finish_reason": finish_reason}], "usage": usage},
+            ]
+            payload = "".join(
+                f"data: {json.dumps(dict(chunk, id='stand-in', object='chat.completion.chunk', created=0, model='stand-in'))}\n\n"
+                for chunk in chunks
+            ) + "data: [DONE]\n\n"
+            self._send(payload.encode("utf-8"), "text/event-stream")
+        else:
+            completion = {"id": "stand-in", "object": "chat.completion", "created": 0, "model": "stand-in",
+                          "choices": [{"index": 0, "message": message, "finish_reason": finish_reason}], "usage": usage}
+            self._send(json.dumps(completion).encode("utf-8"), "application/json")
+
+    def _send(self, payload, content_type):
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+def start_stand_in_llm():
+    """Start the chat completions stand-in on a free local port; returns the server"""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _StandInLLMHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def sample_process(process, turn):
+    """Resource usage of this process and its children"""
+    gc.collect()
+    open_files = process.num_fds() if hasattr(process, "num_fds") else process.num_handles()
+    return {
+        "turn": turn,
+        "time": round(time.time(), 3),
+        "rss_mb": round(process.memory_info().rss / (1024 * 1024), 1),
+        "open_files": open_files,
+        "children": len(process.children(recursive=True)),
+        "threads": process.num_threads(),
+    }
+
+def detect_growth(samples, warmup_fraction=0.2, window=3):
+    """Metrics whose last window stays above the first post-warm-up window by more than the tolerance"""
+    steady = samples[int(len(samples) * warmup_fraction):]
+    if len(steady) < window * 2:
+        return {}
+    growth = {}
+    for metric, tolerance in GROWTH_TOLERANCES.items():
+        baseline = max(sample[metric] for sample in steady[:window])
+        final = min(sample[metric] for sample in steady[-window:])
+        if final - baseline > tolerance:
+            growth[metric] = (baseline, final)
+    return growth
+
+def turn_failed(reply):
+    """A turn fails when it errors or never reaches a tool (every soak query needs one)"""
+    return "Error" in reply or not re.search(r"\b[1-9]\d* tool call\(s\)", reply)
+
+def configure_environment(llm_server):
+    """Point the chatbot's Azure OpenAI settings at the stand-in; call before importing the app"""
+    os.environ["AZURE_OPENAI_ENDPOINT"] = f"http://127.0.0.1:{llm_server.server_address[1]}"
+    os.environ["AZURE_OPENAI_API_KEY"] = "stand-in"
+    os.environ["AZURE_OPENAI_API_VERSION"] = "2025-01-01-preview"
+    os.environ["AZURE_OPENAI_DEPLOYMENT"] = "stand-in"
+    # Stand-ins only: no recorded traffic and no routing to real deployments
+    os.environ["ADOBUDDY_TRAFFIC_MODE"] = "off"
+    os.environ["ADOBUDDY_DEPLOYMENTS"] = "stand-in:large"
+
+def configure_app(app):
+    """Point the chatbot at the stand-in MCP server and stub out the DB Script Maker server.
+
+    tool1 still runs its launch thread and reuse check, but the thread only waits on the
+    returned event instead of starting a Gradio server on the fixed DB Script Maker port.
+    """
+    app.FULL_SPEED_REPLAY = True
+    db_script_maker_stopped = threading.Event()
+    app.launch_db_script_maker = db_script_maker_stopped.wait
+    stand_in_server = {"command": sys.executable, "args": [os.path.abspath(__file__), "--mcp-server"]}
+    set_org_registry(OrgRegistry([
+        AdoOrganization("stand-in", "https://dev.azure.com/stand-in", ["TaxProf"], mcp_server=stand_in_server)
+    ]))
+    return db_script_maker_stopped
+
+async def run_soak(turns, concurrency, launch_every, sample_every, max_errors=0):
+    llm_server = start_stand_in_llm()
+    configure_environment(llm_server)
+    import ADOBuddyPythonVS as app
+
+    db_script_maker_stopped = configure_app(app)
+    process = psutil.Process()
+    samples = [sample_process(process, 0)]
+    completed = 0
+    errors = []  # (turn, reply) of the turns that failed or made no tool call
+    turn_counter = iter(range(1, turns + 1))
+
+    async def worker(worker_id):
+        nonlocal completed
+        request = types.SimpleNamespace(session_hash=f"soak-{worker_id}")
+        history = []
+        for turn in turn_counter:
+            if len(errors) > max_errors:
+                break  # the run has already failed; stop instead of repeating the error
+            if len(history) >= 20:
+                history = []
+            query = SOAK_QUERIES[turn % len(SOAK_QUERIES)]
+            async for history in app.chatbot_response(query, history, request):
+                pass
+            if history and turn_failed(history[-1][1]):
+                errors.append((turn, history[-1][1]))
+            completed += 1
+            if launch_every and turn % launch_every == 0:
+                app.tool1()
+            if turn % sample_every == 0:
+                samples.append(sample_process(process, turn))
+                latest = samples[-1]
+                print(f"[{turn}/{turns}] rss {latest['rss_mb']} MB, {latest['open_files']} open files, "
+                      f"{latest['children']} children, {latest['threads']} threads, {len(errors)} errors")
+
+    try:
+        await asyncio.gather(*(worker(worker_id) for worker_id in range(max(1, concurrency))))
+    finally:
+        db_script_maker_stopped.set()
+        llm_server.shutdown()
+        await get_org_registry().close_session_pools()
+
+    samples.append(sample_process(process, completed))
+    return samples, errors
+
+def main():
+    parser = argparse.ArgumentParser(description="Soak the ADO assistant against local stand-ins and detect resource leaks")
+    parser.add_argument("--turns", type=int, default=2000, help="Number of chat turns to run")
+    parser.add_argument("--concurrency", type=int, default=4, help="Chat sessions running at the same time")
+    parser.add_argument("--launch-every", type=int, default=10, help="Click the DB Script Maker tool every N turns (0 disables)")
+    parser.add_argument("--sample-every", type=int, default=50, help="Sample resource usage every N turns")
+    parser.add_argument("--max-errors", type=int, default=0, help="Stop once more chat turns than this have failed")
+    parser.add_argument("--samples", default=SAMPLES_PATH, help="JSONL file to write the samples to")
+    parser.add_argument("--mcp-server", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mcp_server:
+        run_stand_in_mcp_server()
+        return
+
+    samples, errors = asyncio.run(run_soak(args.turns, args.concurrency, args.launch_every,
+                                           max(1, args.sample_every), max(0, args.max_errors)))
+    os.makedirs(os.path.dirname(args.samples), exist_ok=True)
+    with open(args.samples, 'w', encoding='utf-8') as file:
+        for sample in samples:
+            file.write(json.dumps(sample) + "\n")
+
+    growth = detect_growth(samples)
+    print(f"Wrote {len(samples)} samples to {args.samples}")
+    for metric, (baseline, final) in growth.items():
+        print(f"FAIL: {metric} grew from {baseline} to {final} (tolerance {GROWTH_TOLERANCES[metric]})")
+    if errors:
+        print(f"FAIL: {len(errors)} chat turn(s) returned an error or made no tool call", file=sys.stderr)
+        for turn, reply in errors[:3]:
+            print(f"--- turn {turn} ---\n{reply[-2000:]}", file=sys.stderr)
+    if growth or errors:
+        sys.exit(1)
+    print("No unbounded growth detected")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+import re
+import threading
+
+# Pre-flight validation of MCP tool arguments. Validators are compiled once per tool
+# from the inputSchema the MCP server advertises, then run locally before every
+# call_tool so that simple mistakes are repaired instead of failing on the server
+# and costing another LLM round-trip.
+
+class ToolArgumentError(ValueError):
+    """Raised when tool arguments cannot be repaired locally"""
+
+# Running totals across all sessions; per-run numbers are returned by install_argument_validation
+validation_totals = {"calls": 0, "auto_fixed": 0, "rejected": 0, "retries_saved": 0}
+_totals_lock = threading.Lock()
+
+_TRUE_STRINGS = ("true", "yes", "1")
+_FALSE_STRINGS = ("false", "no", "0")
+
+def _compile_value(schema):
+    """Compile a JSON schema fragment into fn(value, path, fixes, errors) -> value"""
+    schema = schema or {}
+    if "anyOf" in schema:
+        # zod .optional()/.nullable() show up as anyOf with a null branch
+        non_null = [option for option in schema["anyOf"] if option.get("type") != "null"]
+        schema = dict(non_null[0], **{k: v for k, v in schema.items() if k != "anyOf"}) if len(non_null) == 1 else {}
+
+    schema_type = schema.get("type")
+    enum_values = schema.get("enum")
+
+    if enum_values:
+        lookup = {str(value).lower(): value for value in enum_values}
+
+        def check_enum(value, path, fixes, errors):
+            if value in enum_values:
+                return value
+            canonical = lookup.get(str(value).strip().lower())
+            if canonical is not None:
+                fixes.append(f"{path}: {value!r} -> {canonical!r}")
+                return canonical
+            errors.append(f"{path}: {value!r} is not one of {enum_values}")
+            return value
+        return check_enum
+
+    if schema_type in ("number", "integer"):
+        def check_number(value, path, fixes, errors):
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                text = str(value).strip().lstrip('#')
+                try:
+                    number = int(text) if schema_type == "integer" or re.fullmatch(r"-?\d+", text) else float(text)
+                except ValueError:
+                    errors.append(f"{path}: expected a number, got {value!r}")
+                    return value
+                fixes.append(f"{path}: {value!r} -> {number!r}")
+                return number
+            return value
+        return check_number
+
+    if schema_type == "boolean":
+        def check_boolean(value, path, fixes, errors):
+            if isinstance(value, bool):
+                return value
+            text = str(value).strip().lower()
+            if text in _TRUE_STRINGS or text in _FALSE_STRINGS:
+                fixes.append(f"{path}: {value!r} -> {text in _TRUE_STRINGS}")
+                return text in _TRUE_STRINGS
+            errors.append(f"{path}: expected true/false, got {value!r}")
+            return value
+        return check_boolean
+
+    if schema_type == "string":
+        def check_string(value, path, fixes, errors):
+            if isinstance(value, str):
+                return value
+            if isinstance(value, (int, float, bool)):
+                fixes.append(f"{path}: {value!r} -> {str(value)!r}")
+                return str(value)
+            errors.append(f"{path}: expected a string, got {type(value).__name__}")
+            return value
+        return check_string
+
+    if schema_type == "array":
+        check_item = _compile_value(schema.get("items"))
+        item_type = (schema.get("items") or {}).get("type")
+
+        def check_array(value, path, fixes, errors):
+            if isinstance(value, str) and item_type in ("number", "integer", "string") and "," in value:
+                fixes.append(f"{path}: split comma separated string into a list")
+                value = [part.strip() for part in value.split(",") if part.strip()]
+            elif not isinstance(value, list):
+                fixes.append(f"{path}: wrapped single value in a list")
+                value = [value]
+            return [check_item(item, f"{path}[{index}]", fixes, errors) for index, item in enumerate(value)]
+        return check_array
+
+    if schema_type == "object":
+        return _compile_object(schema)
+
+    return lambda value, path, fixes, errors: value
+
+def _compile_object(schema):
+    """Compile an object schema: known properties, required keys and record-style maps"""
+    properties = {name: _compile_value(prop) for name, prop in (schema.get("properties") or {}).items()}
+    required = list(schema.get("required") or [])
+    additional = schema.get("additionalProperties")
+    check_additional = _compile_value(additional) if isinstance(additional, dict) else None
+    hoist_into_fields = "fields" in properties and (schema["properties"]["fields"] or {}).get("type") == "object"
+
+    def check_object(value, path, fixes, errors):
+        if not isinstance(value, dict):
+            errors.append(f"{path or 'arguments'}: expected an object, got {type(value).__name__}")
+            return value
+
+        value = dict(value)
+        if hoist_into_fields:
+            # Work item payloads often arrive with field values at the root instead of under "fields"
+            stray = [key for key in value if key not in properties]
+            if stray:
+                value["fields"] = dict(value.get("fields") or {})
+                for key in stray:
+                    value["fields"][key] = value.pop(key)
+                fixes.append(f"{path or 'arguments'}: moved {stray} into fields")
+
+        for name in required:
+            if name not in value or value[name] is None:
+                errors.append(f"{path + '.' if path else ''}{name}: required argument is missing")
+
+        for name, item in list(value.items()):
+            item_path = f"{path + '.' if path else ''}{name}"
+            if name in properties:
+                if item is None and name not in required:
+                    del value[name]
+                    continue
+                value[name] = properties[name](item, item_path, fixes, errors)
+            elif check_additional is not None:
+                value[name] = check_additional(item, item_path, fixes, errors)
+        return value
+    return check_object
+
+def _fix_field_paths(arguments, fixes):
+    """JSON patch paths must be '/fields/<Reference.Name>'; the model often sends just the name"""
+    for index, update in enumerate(arguments.get("updates") or []):
+        path = update.get("path") if isinstance(update, dict) else None
+        if isinstance(path, str) and not path.startswith("/"):
+            update["path"] = f"/fields/{path}"
+            fixes.append(f"updates[{index}].path: {path!r} -> {update['path']!r}")
+    return arguments
+
+# Tool specific repairs applied after the generic schema pass
+TOOL_FIXUPS = {
+    "wit_update_work_item": _fix_field_paths,
+    "wit_update_work_items_batch": _fix_field_paths,
+}
+
+def compile_tool_validators(tools):
+    """Compile validators for a list of MCP Tool objects, keyed by tool name"""
+    validators = {}
+    for tool in tools:
+        check_arguments = _compile_object(tool.inputSchema or {"type": "object"})
+        fixup = TOOL_FIXUPS.get(tool.name)
+
+        def validate(arguments, check_arguments=check_arguments, fixup=fixup):
+            fixes, errors = [], []
+            normalized = check_arguments(arguments or {}, "", fixes, errors)
+            if fixup and isinstance(normalized, dict):
+                normalized = fixup(normalized, fixes)
+            return normalized, fixes, errors
+        validators[tool.name] = validate
+    return validators
+
+def install_argument_validation(connector):
+    """Wrap connector.call_tool with schema validation; returns live per-run stats"""
+    validators = compile_tool_validators(connector.tools)
+    original_call_tool = connector.call_tool
+    stats = {"calls": 0, "auto_fixed": 0, "rejected": 0, "retries_saved": 0}
+
+    async def call_tool(name, arguments):
+        validate = validators.get(name)
+        if validate is None:
+            return await original_call_tool(name, arguments)
+
+        normalized, fixes, errors = validate(arguments)
+        run_delta = {"calls": 1}
+        if errors:
+            run_delta["rejected"] = 1
+        elif fixes:
+            # A repaired call would otherwise have failed server side and cost one more agent step
+            run_delta["auto_fixed"] = 1
+            run_delta["retries_saved"] = 1
+            print(f"[validator] {name}: auto-fixed {'; '.join(fixes)}")
+
+        with _totals_lock:
+            for key, delta in run_delta.items():
+                stats[key] += delta
+                validation_totals[key] += delta
+
+        if errors:
+            raise ToolArgumentError(f"Invalid arguments for {name}: {'; '.join(errors)}")
+        return await original_call_tool(name, normalized)
+
+    connector.call_tool = call_tool
+    return stats
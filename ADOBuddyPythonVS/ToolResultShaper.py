@@ -0,0 +1,296 @@
+import re
+import json
+import hashlib
+import threading
+from itertools import chain
+from collections import OrderedDict
+from mcp.types import CallToolResult, TextContent
+from ToolArgumentValidator import ToolArgumentError
+
+# Shapes large MCP tool results before they reach the LLM. List payloads are parsed
+# item by item, each item is projected to the fields relevant to the tool (plus any
+# field the question mentions), and only one page is returned. The full payload is
+# kept in memory by reference so later pages, or untrimmed items, are served locally.
+SHAPE_THRESHOLD_CHARS = 4000
+PAGE_SIZE = 25
+MAX_CACHED_RESULTS = 32
+MAX_CACHED_CHARS = 50 * 1024 * 1024
+
+# Fields kept per item, as "/" separated paths (field reference names contain dots)
+_WORK_ITEM_FIELDS = [
+    "id", "fields/System.WorkItemType", "fields/System.Title", "fields/System.State",
+    "fields/System.AssignedTo/displayName", "fields/System.IterationPath",
+    "fields/System.ChangedDate", "fields/System.Tags", "fields/System.Parent",
+]
+_PULL_REQUEST_FIELDS = [
+    "pullRequestId", "title", "status", "isDraft", "createdBy/displayName", "creationDate",
+    "sourceRefName", "targetRefName", "repository/name", "mergeStatus",
+]
+FIELD_PROJECTIONS = {
+    "build_get_builds": [
+        "id", "buildNumber", "status", "result", "definition/id", "definition/name", "queueTime",
+        "startTime", "finishTime", "sourceBranch", "sourceVersion", "reason", "requestedFor/displayName",
+        "_links/web/href",
+    ],
+    "build_get_definitions": ["id", "name", "path", "queueStatus", "latestBuild/id", "latestBuild/result", "latestBuild/finishTime"],
+    "build_get_changes": ["id", "message", "author/displayName", "timestamp", "type"],
+    "release_get_releases": ["id", "name", "status", "createdOn", "releaseDefinition/name", "createdBy/displayName"],
+    "release_get_definitions": ["id", "name", "path", "createdBy/displayName"],
+    "repo_list_repos_by_project": ["id", "name", "defaultBranch", "webUrl", "size", "isDisabled"],
+    "repo_list_pull_requests_by_repo": _PULL_REQUEST_FIELDS,
+    "repo_list_pull_requests_by_project": _PULL_REQUEST_FIELDS,
+    "wit_get_work_items_batch_by_ids": _WORK_ITEM_FIELDS,
+    "wit_get_work_items_for_iteration": _WORK_ITEM_FIELDS,
+    "wit_list_backlog_work_items": _WORK_ITEM_FIELDS,
+    "wit_my_work_items": _WORK_ITEM_FIELDS,
+    "wit_get_query_results_by_id": _WORK_ITEM_FIELDS,
+    "search_workitem": _WORK_ITEM_FIELDS,
+    "testplan_list_test_plans": ["id", "name", "state", "iteration", "owner/displayName"],
+    "testplan_list_test_cases": ["workItem/id", "workItem/name", "pointAssignments"],
+}
+
+# Arguments added to the shaped tools' schemas; tool argument models reject names
+# with a leading underscore, so these are plain names a tool is unlikely to use itself
+PAGE_ARGUMENT = "result_page"
+FULL_ARGUMENT = "full_result"
+
+# Keys inside a wrapping object that hold the list to page through
+_LIST_KEYS = ("value", "workItems", "results", "builds", "items")
+
+shaping_stats = {"shaped": 0, "chars_in": 0, "chars_out": 0, "pages_from_cache": 0}
+
+_results = OrderedDict()
+_results_chars = 0
+_results_lock = threading.Lock()
+
+def _store_result(ref, tool_name, text, scope="", arguments=None):
+    """Keep a full payload by reference, evicting the oldest beyond the limits"""
+    global _results_chars
+    with _results_lock:
+        if ref in _results:
+            _results.move_to_end(ref)
+            return
+        _results[ref] = (tool_name, text, scope, arguments or {})
+        _results_chars += len(text)
+        while len(_results) > MAX_CACHED_RESULTS or _results_chars > MAX_CACHED_CHARS:
+            _, evicted = _results.popitem(last=False)
+            _results_chars -= len(evicted[1])
+
+def get_result(ref):
+    """Return the full payload stored under a result reference, or None"""
+    with _results_lock:
+        entry = _results.get(ref)
+    return entry[1] if entry else None
+
+# Tool arguments naming the work item(s) a result is about
+_WORK_ITEM_ID_ARGUMENTS = ("id", "workItemId", "ids")
+
+def _argument_ids(arguments):
+    ids = set()
+    for name in _WORK_ITEM_ID_ARGUMENTS:
+        value = arguments.get(name)
+        values = value if isinstance(value, (list, tuple)) else re.split(r"[,\s]+", str(value or ""))
+        ids.update(str(item).strip() for item in values if str(item).strip())
+    return ids
+
+def _result_affected(arguments, project, work_item_id):
+    """False only when the call's arguments show it is about another project or other work items"""
+    called_project = arguments.get("project")
+    if project and called_project and str(called_project).lower() != str(project).lower():
+        return False
+    ids = _argument_ids(arguments)
+    if work_item_id is not None and ids and str(work_item_id) not in ids:
+        return False
+    return True
+
+def invalidate_results(tool_prefixes=None, scope=None, project=None, work_item_id=None):
+    """Drop cached payloads that a change may have made stale; returns the count.
+
+    Only tools starting with any of tool_prefixes (all when None) in the given scope (every
+    scope when None) are considered, and of those only calls not tied by their arguments
+    to another project or to other work items.
+    """
+    global _results_chars
+    with _results_lock:
+        refs = [ref for ref, (tool_name, _, result_scope, arguments) in _results.items()
+                if (tool_prefixes is None or tool_name.startswith(tuple(tool_prefixes)))
+                and (scope is None or result_scope.lower() == scope.lower())
+                and _result_affected(arguments, project, work_item_id)]
+        for ref in refs:
+            _results_chars -= len(_results.pop(ref)[1])
+    return len(refs)
+
+def iter_json_items(text):
+    """Yield the top level items of a JSON array one at a time without parsing it as a whole.
+
+    Returns a single-element iterator with the decoded value when text is not an array.
+    """
+    decoder = json.JSONDecoder()
+    index = len(text) - len(text.lstrip())
+    if not text.startswith("[", index):
+        yield json.loads(text)
+        return
+
+    index += 1
+    length = len(text)
+    while index < length:
+        while index < length and text[index] in " \t\r\n,":
+            index += 1
+        if index >= length or text[index] == "]":
+            return
+        item, index = decoder.raw_decode(text, index)
+        yield item
+
+def _get_path(item, path):
+    value = item
+    for part in path.split("/"):
+        if not isinstance(value, dict) or part not in value:
+            return None
+        value = value[part]
+    return value
+
+def _set_path(target, path, value):
+    parts = path.split("/")
+    for part in parts[:-1]:
+        target = target.setdefault(part, {})
+    target[parts[-1]] = value
+
+def query_terms(user_message):
+    """Words from the question that may name extra fields worth keeping"""
+    return {word for word in re.findall(r"[a-z]{4,}", str(user_message or "").lower())}
+
+def project_item(item, paths, terms=()):
+    """Keep only the configured paths plus any top level or System field the question mentions"""
+    if not isinstance(item, dict):
+        return item
+    projected = {}
+    for path in paths:
+        value = _get_path(item, path)
+        if value is not None:
+            _set_path(projected, path, value)
+    for container, prefix in ((item, ""), (item.get("fields") if isinstance(item.get("fields"), dict) else {}, "fields/")):
+        for key, value in container.items():
+            short_name = key.split(".")[-1].lower()
+            if any(term in short_name for term in terms) and _get_path(projected, prefix + key) is None:
+                _set_path(projected, prefix + key, value)
+    return projected
+
+def shape_text(tool_name, text, page=1, full=False, terms=(), ref=None):
+    """Shape a JSON tool payload; returns the shaped text or None when it should pass through"""
+    paths = FIELD_PROJECTIONS.get(tool_name)
+    items = []
+    total = 0
+    start = (page - 1) * PAGE_SIZE
+    try:
+        iterator = iter_json_items(text)
+        first = next(iterator, None)
+        if isinstance(first, dict) and not text.lstrip().startswith("["):
+            list_key = next((key for key in _LIST_KEYS if isinstance(first.get(key), list)), None)
+            if list_key is None:
+                return None
+            iterator = iter(first[list_key])
+            first = next(iterator, None)
+        for item in chain([first] if first is not None else [], iterator):
+            total += 1
+            if start < total <= start + PAGE_SIZE:
+                items.append(item if full or not paths else project_item(item, paths, terms))
+    except (json.JSONDecodeError, ValueError):
+        return None
+
+    pages = max(1, -(-total // PAGE_SIZE))
+    if page > pages:
+        # Serve the last page rather than an empty one with a nonsensical range
+        shaped = json.loads(shape_text(tool_name, text, pages, full, terms, ref))
+        shaped["note"] = f"Page {page} does not exist; this result has {pages} page(s). {shaped.get('note', '')}".strip()
+        return json.dumps(shaped, separators=(",", ":"))
+
+    shaped = {
+        "items": items,
+        "page": page,
+        "pages": pages,
+        "total": total,
+        "result_ref": ref,
+    }
+    notes = []
+    if pages > 1:
+        notes.append(f"Showing items {start + 1}-{min(total, start + PAGE_SIZE)} of {total}. "
+                     f"For more, call {tool_name} again with the same arguments plus \"{PAGE_ARGUMENT}\": <n>.")
+    if paths and not full:
+        notes.append(f"Fields were trimmed to the most relevant ones; add \"{FULL_ARGUMENT}\": true for complete items.")
+    if notes:
+        shaped["note"] = " ".join(notes)
+    return json.dumps(shaped, separators=(",", ":"))
+
+def _add_paging_arguments(tool):
+    """Advertise the paging arguments so the model can request more without the schema dropping them.
+
+    Returns False when the tool already has arguments of those names; they are left to the tool.
+    """
+    schema = tool.inputSchema or {}
+    properties = schema.get("properties") or {}
+    if PAGE_ARGUMENT in properties or FULL_ARGUMENT in properties:
+        return False
+    # Swap in a copy: the tool objects may be shared with other runs through the session pool
+    properties = {
+        PAGE_ARGUMENT: {"type": "integer", "description": "Page of a large result to return (starts at 1)."},
+        FULL_ARGUMENT: {"type": "boolean", "description": "Return complete items instead of trimmed fields."},
+        **properties,
+    }
+    tool.inputSchema = {**schema, "properties": properties}
+    return True
+
+def _page_argument(name, value):
+    if value is None or value == "":
+        return 1
+    try:
+        page = int(value)
+    except (TypeError, ValueError):
+        page = None
+    if page is None or page < 1 or isinstance(value, bool) or (isinstance(value, float) and not value.is_integer()):
+        raise ToolArgumentError(f"Invalid arguments for {name}: {PAGE_ARGUMENT} must be a positive integer, got {value!r}")
+    return page
+
+def install_result_shaper(connector, user_message=None, is_read_only_tool=None, scope=""):
+    """Shape large read-only tool results and serve further pages from the cached payload.
+
+    Install it last so it is the outermost wrapper and strips the paging arguments before validation.
+    Cached payloads are keyed per scope (organization).
+    """
+    terms = query_terms(user_message)
+    paged_tools = {
+        tool.name for tool in connector.tools
+        if (tool.name in FIELD_PROJECTIONS or (is_read_only_tool and is_read_only_tool(tool.name)))
+        and _add_paging_arguments(tool)
+    }
+
+    original_call_tool = connector.call_tool
+
+    async def call_tool(name, arguments):
+        arguments = dict(arguments or {})
+        page, full = 1, False
+        if name in paged_tools:
+            page = _page_argument(name, arguments.pop(PAGE_ARGUMENT, None))
+            full = bool(arguments.pop(FULL_ARGUMENT, False))
+        ref = hashlib.sha256(json.dumps([scope, name, arguments], sort_keys=True, default=str).encode("utf-8")).hexdigest()[:16]
+
+        text = get_result(ref) if page > 1 or full else None
+        if text is not None:
+            shaping_stats["pages_from_cache"] += 1
+        else:
+            result = await original_call_tool(name, arguments)
+            texts = [item.text for item in result.content or [] if getattr(item, "type", None) == "text"]
+            if result.isError or len(texts) != 1 or len(texts[0]) < SHAPE_THRESHOLD_CHARS:
+                return result
+            text = texts[0]
+            _store_result(ref, name, text, scope, arguments)
+
+        shaped = shape_text(name, text, page, full, terms, ref)
+        if shaped is None:
+            return CallToolResult(content=[TextContent(type="text", text=text)])
+
+        shaping_stats["shaped"] += 1
+        shaping_stats["chars_in"] += len(text)
+        shaping_stats["chars_out"] += len(shaped)
+        return CallToolResult(content=[TextContent(type="text", text=shaped)])
+
+    connector.call_tool = call_tool
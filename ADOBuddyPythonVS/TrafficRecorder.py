@@ -0,0 +1,191 @@
+import os
+import json
+import hashlib
+import threading
+from langchain_core.caches import BaseCache
+from langchain_core.load import dumps, loads
+from mcp.types import CallToolResult, Tool
+from mcp_use.client.connectors import BaseConnector
+from InstantDBScriptMaker import load_env_config
+
+# Record/replay of LLM and MCP traffic. In "record" mode every LLM response and
+# MCP tool result is appended to a JSONL log keyed by a content hash of the request.
+# In "replay" mode the same requests are answered from the log without Azure OpenAI
+# or ADO, deterministically and at full speed, so process_query can be profiled and
+# exercised offline (e.g. in CI).
+#
+#   ADOBUDDY_TRAFFIC_MODE=off|record|replay
+#   ADOBUDDY_TRAFFIC_LOG=<path>   (default .adobuddy/traffic.jsonl)
+script_dir = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_TRAFFIC_LOG = os.path.join(script_dir, ".adobuddy", "traffic.jsonl")
+
+class ReplayMissError(LookupError):
+    """Raised in replay mode when a request was never recorded"""
+
+def get_traffic_mode():
+    """Return off, record or replay from the environment or .env"""
+    mode = os.environ.get("ADOBUDDY_TRAFFIC_MODE") or load_env_config().get("ADOBUDDY_TRAFFIC_MODE", "off")
+    mode = mode.strip().lower()
+    return mode if mode in ("record", "replay") else "off"
+
+def content_key(*parts):
+    """Stable hash of a request: identical content always maps to the same key"""
+    canonical = json.dumps(parts, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:32]
+
+class TrafficLog:
+    """Append-only JSONL log of {kind, key, response} entries, loaded into memory"""
+
+    def __init__(self, path=None, mode="record"):
+        self.path = path or os.environ.get("ADOBUDDY_TRAFFIC_LOG") or DEFAULT_TRAFFIC_LOG
+        self.mode = mode
+        self.hits = 0
+        self.misses = 0
+        self._entries = {}
+        self._lock = threading.Lock()
+        if os.path.exists(self.path):
+            with open(self.path, 'r', encoding='utf-8') as file:
+                for line in file:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self._entries[(entry["kind"], entry["key"])] = entry["response"]
+
+    def lookup(self, kind, key):
+        """Return the recorded response; in replay mode a miss raises ReplayMissError"""
+        response = self._entries.get((kind, key))
+        if response is None:
+            self.misses += 1
+            if self.mode == "replay":
+                raise ReplayMissError(f"No recorded {kind} response for key {key} in {self.path}")
+        else:
+            self.hits += 1
+        return response
+
+    def record(self, kind, key, response):
+        """Append a response unless an identical request is already recorded"""
+        with self._lock:
+            if (kind, key) in self._entries:
+                return
+            self._entries[(kind, key)] = response
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path, 'a', encoding='utf-8') as file:
+                file.write(json.dumps({"kind": kind, "key": key, "response": response}, separators=(",", ":")) + "\n")
+
+# Message fields that describe how a response was produced rather than what it says;
+# replayed responses come back with cache-hit usage (e.g. a zero total_cost), so
+# they are left out of the key of the follow-up requests that quote them
+_VOLATILE_MESSAGE_FIELDS = ("usage_metadata", "response_metadata")
+
+def _strip_volatile_fields(value):
+    if isinstance(value, dict):
+        return {key: _strip_volatile_fields(item) for key, item in value.items() if key not in _VOLATILE_MESSAGE_FIELDS}
+    if isinstance(value, list):
+        return [_strip_volatile_fields(item) for item in value]
+    return value
+
+def llm_request_key(prompt, llm_string):
+    """Content key of an LLM request, ignoring the usage details of earlier responses in the prompt"""
+    try:
+        prompt = _strip_volatile_fields(json.loads(prompt))
+    except (TypeError, ValueError):
+        pass
+    return content_key(prompt, llm_string)
+
+class TrafficLLMCache(BaseCache):
+    """LangChain cache that records LLM generations or replays them from the traffic log"""
+
+    def __init__(self, traffic_log):
+        self.traffic_log = traffic_log
+
+    def lookup(self, prompt, llm_string):
+        if self.traffic_log.mode != "replay":
+            # Recording always goes to the model so the log reflects real responses
+            return None
+        generations = self.traffic_log.lookup("llm", llm_request_key(prompt, llm_string))
+        return [loads(generation) for generation in generations]
+
+    def update(self, prompt, llm_string, return_val):
+        if self.traffic_log.mode == "record":
+            self.traffic_log.record("llm", llm_request_key(prompt, llm_string), [dumps(generation) for generation in return_val])
+
+    def clear(self, **kwargs):
+        pass
+
+def install_traffic_recorder(connector, traffic_log):
+    """Record the tool list and every tool call result of a live MCP session.
+
+    Install it after parallel dispatch but before validation, so the recorded keys use the
+    same normalized arguments that ReplayConnector will see on replay.
+    """
+    traffic_log.record("tools", "tools", [tool.model_dump(mode="json") for tool in connector.tools])
+    original_call_tool = connector.call_tool
+
+    async def call_tool(name, arguments):
+        result = await original_call_tool(name, arguments)
+        traffic_log.record("tool", content_key(name, arguments), result.model_dump(mode="json"))
+        return result
+
+    connector.call_tool = call_tool
+
+class ReplayConnector(BaseConnector):
+    """Stand-in for the ADO MCP server that serves the recorded tool list and results.
+
+    Implements the mcp-use 1.7 BaseConnector contract. Only tools are recorded, so it
+    offers no resources or prompts.
+    """
+
+    def __init__(self, traffic_log):
+        super().__init__()
+        self.traffic_log = traffic_log
+
+    @property
+    def public_identifier(self):
+        return f"replay:{self.traffic_log.path}"
+
+    async def connect(self):
+        self._connected = True
+
+    async def disconnect(self):
+        self._connected = False
+
+    async def initialize(self):
+        if not self._initialized:
+            self._tools = [Tool.model_validate(tool) for tool in self.traffic_log.lookup("tools", "tools")]
+            self._resources = []
+            self._prompts = []
+            self._initialized = True
+        return None
+
+    @property
+    def is_connected(self):
+        return self._connected
+
+    @property
+    def tools(self):
+        return self._tools or []
+
+    @property
+    def resources(self):
+        return self._resources or []
+
+    @property
+    def prompts(self):
+        return self._prompts or []
+
+    async def list_tools(self):
+        return self.tools
+
+    async def list_resources(self):
+        return self.resources
+
+    async def list_prompts(self):
+        return self.prompts
+
+    async def call_tool(self, name, arguments, read_timeout_seconds=None):
+        return CallToolResult.model_validate(self.traffic_log.lookup("tool", content_key(name, arguments)))
+
+    async def read_resource(self, uri):
+        raise ReplayMissError(f"Resources are not recorded: {uri}")
+
+    async def get_prompt(self, name, arguments=None):
+        raise ReplayMissError(f"Prompts are not recorded: {name}")
@@ -0,0 +1,526 @@
+import os
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+import requests
+from AdoAuth import get_organization_url, get_ado_auth_token, build_ado_headers, get_http_session
+from OrgRegistry import get_org_registry
+
+# Local SQLite index of the work items relevant to the signed-in user, so list/filter
+# questions can be answered without an LLM round-trip or live ADO calls.
+script_dir = os.path.dirname(os.path.abspath(__file__))
+INDEX_DB_PATH = os.path.join(script_dir, ".adobuddy", "workitem_index.db")
+
+BATCH_SIZE = 200  # workitemsbatch accepts at most 200 ids per request
+WIQL_ID_CHUNK = 500  # ids per "[System.Id] IN (...)" clause, well inside the WIQL length limit
+RECENT_CHANGES_DAYS = 30
+STALE_AFTER_SECONDS = 15 * 60
+COMPLETED_STATES = ("Closed", "Done", "Removed", "Resolved")
+INDEX_SCHEMA_VERSION = 2  # 2: rows and sync state are keyed by organization too
+
+INDEX_FIELDS = [
+    "System.Id",
+    "System.TeamProject",
+    "System.WorkItemType",
+    "System.Title",
+    "System.State",
+    "System.AssignedTo",
+    "System.AreaPath",
+    "System.IterationPath",
+    "System.Tags",
+    "System.ChangedDate"
+]
+
+_IDENTITY_STRING = re.compile(r"^(.*?)\s*<([^<>]+)>\s*$")
+
+_sync_locks = {}
+_sync_locks_guard = threading.Lock()
+
+def _connect(db_path=None):
+    """Open the index database, creating the schema on first use"""
+    db_path = db_path or INDEX_DB_PATH
+    os.makedirs(os.path.dirname(db_path), exist_ok=True)
+    conn = sqlite3.connect(db_path, timeout=30)
+    conn.row_factory = sqlite3.Row
+    if conn.execute("PRAGMA user_version").fetchone()[0] < INDEX_SCHEMA_VERSION:
+        # The index is a cache: older layouts are dropped and rebuilt by the next sync
+        conn.executescript(f"""
+            DROP TABLE IF EXISTS work_items;
+            DROP TABLE IF EXISTS sync_state;
+            PRAGMA user_version = {INDEX_SCHEMA_VERSION};
+        """)
+    conn.executescript("""
+        CREATE TABLE IF NOT EXISTS work_items (
+            organization TEXT COLLATE NOCASE,
+            id INTEGER,
+            project TEXT COLLATE NOCASE,
+            work_item_type TEXT COLLATE NOCASE,
+            title TEXT,
+            state TEXT COLLATE NOCASE,
+            assigned_to TEXT,
+            assigned_to_unique TEXT COLLATE NOCASE,
+            area_path TEXT COLLATE NOCASE,
+            iteration_path TEXT,
+            tags TEXT,
+            changed_date TEXT,
+            PRIMARY KEY (organization, id)
+        );
+        CREATE INDEX IF NOT EXISTS ix_work_items_project_assigned
+            ON work_items (organization, project, assigned_to_unique, state);
+        CREATE TABLE IF NOT EXISTS sync_state (
+            organization TEXT COLLATE NOCASE,
+            project TEXT COLLATE NOCASE,
+            user_unique_name TEXT,
+            watermark TEXT,
+            last_synced_at REAL,
+            PRIMARY KEY (organization, project)
+        );
+    """)
+    return conn
+
+def _parse_changed_date(value):
+    """ChangedDate as an aware UTC datetime; ADO sends 0-7 fraction digits and a Z or offset"""
+    if not value:
+        return None
+    text = str(value).strip().replace("Z", "+00:00").replace("z", "+00:00")
+    match = re.match(r"^([^.+]+T[^.+-]+)(?:\.(\d+))?(.*)$", text)
+    if match:
+        # fromisoformat takes at most microseconds
+        fraction = (match.group(2) or "")[:6]
+        text = match.group(1) + (f".{fraction.ljust(6, '0')}" if fraction else "") + match.group(3)
+    try:
+        parsed = datetime.fromisoformat(text)
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc)
+
+def _format_changed_date(parsed):
+    """UTC ISO string with millisecond precision, so stored dates compare and sort as text"""
+    return parsed.isoformat(timespec="milliseconds").replace("+00:00", "Z")
+
+def _normalize_changed_date(value):
+    """ChangedDate in the stored format; values that do not parse are kept as they are"""
+    parsed = _parse_changed_date(value)
+    return _format_changed_date(parsed) if parsed else value
+
+def _organization_key(organization_url=None):
+    """Organization column value: the normalized URL (the default organization when none is given)"""
+    return (organization_url or get_org_registry().default.url).rstrip('/').lower()
+
+def _get_project_lock(organization, project):
+    with _sync_locks_guard:
+        return _sync_locks.setdefault((organization, project.lower()), threading.Lock())
+
+def _get_authenticated_user(organization_url, headers):
+    """Return the unique name (email) of the user the token belongs to"""
+    response = get_http_session(organization_url).get(f"{organization_url}/_apis/connectionData", headers=headers)
+    response.raise_for_status()
+    user = response.json().get('authenticatedUser', {})
+    account = user.get('properties', {}).get('Account', {}).get('$value')
+    return account or user.get('providerDisplayName', '')
+
+def _build_sync_wiql(project, area_paths, watermark):
+    """Build the WIQL selecting assigned, team-area and recently touched work items"""
+    scope = ["[System.AssignedTo] = @Me",
+             f"([System.ChangedBy] = @Me AND [System.ChangedDate] >= @Today - {RECENT_CHANGES_DAYS})"]
+    for area_path in area_paths or []:
+        escaped_area = area_path.replace("'", "''")
+        scope.append(f"[System.AreaPath] UNDER '{escaped_area}'")
+
+    escaped_project = project.replace("'", "''")
+    wiql = (
+        "SELECT [System.Id] FROM WorkItems "
+        f"WHERE [System.TeamProject] = '{escaped_project}' "
+        f"AND ({' OR '.join(scope)})"
+    )
+    if watermark:
+        # >= rather than > so items sharing the watermark timestamp are never skipped
+        wiql += f" AND [System.ChangedDate] >= '{watermark}'"
+    return wiql + " ORDER BY [System.ChangedDate] ASC"
+
+def _find_changed_ids(organization_url, headers, ids, watermark):
+    """Ids among the given ones changed since the watermark (in any project or assignment)"""
+    changed = set()
+    wiql_url = f"{organization_url}/_apis/wit/wiql?timePrecision=true&api-version=7.0"
+    for start in range(0, len(ids), WIQL_ID_CHUNK):
+        id_list = ", ".join(str(work_item_id) for work_item_id in ids[start:start + WIQL_ID_CHUNK])
+        response = get_http_session(organization_url).post(
+            wiql_url,
+            json={"query": f"SELECT [System.Id] FROM WorkItems WHERE [System.Id] IN ({id_list}) "
+                           f"AND [System.ChangedDate] >= '{watermark}'"},
+            headers=headers
+        )
+        response.raise_for_status()
+        changed.update(item['id'] for item in response.json().get('workItems', []))
+    return changed
+
+def _row_from_work_item(work_item, organization):
+    """Flatten a work item REST payload into an index row"""
+    fields = work_item.get('fields', {})
+    assigned_to = fields.get('System.AssignedTo')
+    if isinstance(assigned_to, dict):
+        assigned_display = assigned_to.get('displayName', '')
+        assigned_unique = assigned_to.get('uniqueName', '')
+    else:
+        # Service hook payloads carry identities as "Display Name <user@example.com>"
+        assigned_display = str(assigned_to) if assigned_to else ''
+        assigned_unique = assigned_display
+        match = _IDENTITY_STRING.match(assigned_display)
+        if match:
+            assigned_display, assigned_unique = match.group(1).strip(), match.group(2).strip()
+
+    return (
+        organization,
+        work_item.get('id'),
+        fields.get('System.TeamProject'),
+        fields.get('System.WorkItemType'),
+        fields.get('System.Title'),
+        fields.get('System.State'),
+        assigned_display,
+        assigned_unique,
+        fields.get('System.AreaPath'),
+        fields.get('System.IterationPath'),
+        fields.get('System.Tags'),
+        _normalize_changed_date(fields.get('System.ChangedDate'))
+    )
+
+def upsert_work_items(work_items, organization_url=None, db_path=None):
+    """Insert or replace work item payloads of one organization in the index"""
+    organization = _organization_key(organization_url)
+    rows = [_row_from_work_item(work_item, organization) for work_item in work_items if work_item.get('id')]
+    if not rows:
+        return 0
+    conn = _connect(db_path)
+    try:
+        with conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO work_items VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows
+            )
+    finally:
+        conn.close()
+    return len(rows)
+
+def apply_work_item_event(work_item, deleted=False, db_path=None, organization_url=None):
+    """Patch the index from a pushed work item change (service hook).
+
+    Updates items that are already indexed and adds ones assigned to the indexed user.
+    Returns True if the index changed.
+    """
+    work_item_id = work_item.get('id')
+    if not work_item_id:
+        return False
+    organization = _organization_key(organization_url)
+    conn = _connect(db_path)
+    try:
+        with conn:
+            if deleted:
+                return conn.execute("DELETE FROM work_items WHERE organization = ? AND id = ?",
+                                    (organization, work_item_id)).rowcount > 0
+
+            row = _row_from_work_item(work_item, organization)
+            existing = conn.execute("SELECT changed_date FROM work_items WHERE organization = ? AND id = ?",
+                                    (organization, work_item_id)).fetchone()
+            if existing is None:
+                state = conn.execute("SELECT user_unique_name FROM sync_state WHERE organization = ? AND project = ?",
+                                     (organization, row[2] or '')).fetchone()
+                if state is None or not row[7] or row[7].lower() != (state['user_unique_name'] or '').lower():
+                    return False
+            else:
+                existing_changed = _parse_changed_date(existing['changed_date'])
+                event_changed = _parse_changed_date(row[11])
+                if existing_changed and event_changed and existing_changed > event_changed:
+                    # An older revision delivered late must not overwrite a newer one
+                    return False
+            conn.execute("INSERT OR REPLACE INTO work_items VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", row)
+            return True
+    finally:
+        conn.close()
+
+def sync_work_item_index(project, area_paths=None, organization_url=None, db_path=None, full=False):
+    """Incrementally sync the local index for a project using a System.ChangedDate watermark.
+
+    Returns (synced_count, message).
+    """
+    organization_url = (organization_url or get_organization_url()).rstrip('/')
+    organization = _organization_key(organization_url)
+    lock = _get_project_lock(organization, project)
+    if not lock.acquire(blocking=False):
+        return 0, f"Sync already running for {project}"
+
+    try:
+        auth_token, use_pat, auth_message = get_ado_auth_token(organization_url)
+        if not auth_token:
+            return 0, f"Authentication failed: {auth_message}"
+        headers = build_ado_headers(auth_token, use_pat)
+
+        conn = _connect(db_path)
+        try:
+            state = conn.execute("SELECT * FROM sync_state WHERE organization = ? AND project = ?",
+                                 (organization, project)).fetchone()
+        finally:
+            conn.close()
+
+        watermark = None if full or state is None else state['watermark']
+        user_unique_name = state['user_unique_name'] if state is not None else None
+        if not user_unique_name:
+            user_unique_name = _get_authenticated_user(organization_url, headers)
+
+        wiql_url = f"{organization_url}/{project}/_apis/wit/wiql?timePrecision=true&api-version=7.0"
+        response = get_http_session(organization_url).post(
+            wiql_url,
+            json={"query": _build_sync_wiql(project, area_paths, watermark)},
+            headers=headers
+        )
+        if response.status_code != 200:
+            return 0, f"WIQL query failed: HTTP {response.status_code}: {response.text}"
+
+        ids = [item['id'] for item in response.json().get('workItems', [])]
+
+        if watermark:
+            # Indexed items that changed but no longer match the scope (reassigned, moved to
+            # another area or project) are dropped; the scoped query never returns them again
+            conn = _connect(db_path)
+            try:
+                indexed_ids = [row['id'] for row in conn.execute(
+                    "SELECT id FROM work_items WHERE organization = ? AND project = ?", (organization, project))]
+            finally:
+                conn.close()
+            left_scope = _find_changed_ids(organization_url, headers, indexed_ids, watermark) - set(ids)
+            if left_scope:
+                conn = _connect(db_path)
+                try:
+                    with conn:
+                        conn.executemany("DELETE FROM work_items WHERE organization = ? AND id = ?",
+                                         [(organization, work_item_id) for work_item_id in left_scope])
+                finally:
+                    conn.close()
+
+        synced = 0
+        new_watermark = _parse_changed_date(watermark)
+        batch_url = f"{organization_url}/{project}/_apis/wit/workitemsbatch?api-version=7.0"
+        for start in range(0, len(ids), BATCH_SIZE):
+            batch_ids = ids[start:start + BATCH_SIZE]
+            response = get_http_session(organization_url).post(
+                batch_url,
+                json={"ids": batch_ids, "fields": INDEX_FIELDS, "errorPolicy": "omit"},
+                headers=headers
+            )
+            if response.status_code != 200:
+                return synced, f"Batch fetch failed: HTTP {response.status_code}: {response.text}"
+
+            work_items = [item for item in response.json().get('value', []) if item]
+            synced += upsert_work_items(work_items, organization_url, db_path)
+            for work_item in work_items:
+                changed_date = _parse_changed_date(work_item.get('fields', {}).get('System.ChangedDate'))
+                if changed_date and (new_watermark is None or changed_date > new_watermark):
+                    new_watermark = changed_date
+
+        conn = _connect(db_path)
+        try:
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO sync_state VALUES (?, ?, ?, ?, ?)",
+                    (organization, project, user_unique_name,
+                     _format_changed_date(new_watermark) if new_watermark else watermark, time.time())
+                )
+        finally:
+            conn.close()
+
+        return synced, "Success"
+
+    except requests.exceptions.RequestException as e:
+        return 0, f"Request error: {e}"
+    except Exception as e:
+        return 0, f"Error syncing work item index: {e}"
+    finally:
+        lock.release()
+
+def sync_in_background(project, area_paths=None, organization_url=None, db_path=None):
+    """Start an incremental sync on a daemon thread"""
+    thread = threading.Thread(
+        target=sync_work_item_index,
+        args=(project, area_paths, organization_url, db_path),
+        daemon=True
+    )
+    thread.start()
+    return thread
+
+def get_index_freshness(project, db_path=None, organization_url=None):
+    """Return (last_synced_at, age_seconds) for a project, or (None, None) if never synced"""
+    conn = _connect(db_path)
+    try:
+        state = conn.execute("SELECT last_synced_at FROM sync_state WHERE organization = ? AND project = ?",
+                             (_organization_key(organization_url), project)).fetchone()
+    finally:
+        conn.close()
+
+    if state is None or state['last_synced_at'] is None:
+        return None, None
+    return state['last_synced_at'], time.time() - state['last_synced_at']
+
+def format_freshness(project, db_path=None, organization_url=None):
+    """Human readable freshness indicator for answers served from the index"""
+    last_synced_at, age_seconds = get_index_freshness(project, db_path, organization_url)
+    if last_synced_at is None:
+        return f"Index for {project} has never been synced"
+
+    synced_at = datetime.fromtimestamp(last_synced_at, tz=timezone.utc).strftime('%Y-%m-%d %H:%M UTC')
+    if age_seconds < 60:
+        age = "just now"
+    elif age_seconds < 3600:
+        age = f"{int(age_seconds // 60)} min ago"
+    else:
+        age = f"{age_seconds / 3600:.1f} h ago"
+    stale = " (stale, refreshing in background)" if age_seconds > STALE_AFTER_SECONDS else ""
+    return f"Index synced {age} at {synced_at}{stale}"
+
+def query_work_item_index(project=None, assigned_to_me=False, work_item_type=None, state=None,
+                          text=None, include_completed=False, top=50, db_path=None, organization_url=None):
+    """Answer a list/filter question from the local index of one organization.
+
+    Returns (rows, freshness) where rows is a list of dicts ordered by most recent change.
+    """
+    clauses = ["w.organization = ?"]
+    params = [_organization_key(organization_url)]
+    if project:
+        clauses.append("w.project = ?")
+        params.append(project)
+    if assigned_to_me:
+        clauses.append("w.assigned_to_unique = s.user_unique_name")
+    if work_item_type:
+        clauses.append("w.work_item_type = ?")
+        params.append(work_item_type)
+    if isinstance(state, (list, tuple)):
+        clauses.append(f"w.state IN ({', '.join('?' for _ in state)})")
+        params.extend(state)
+    elif state:
+        clauses.append("w.state = ?")
+        params.append(state)
+    elif not include_completed:
+        clauses.append(f"w.state NOT IN ({', '.join('?' for _ in COMPLETED_STATES)})")
+        params.extend(COMPLETED_STATES)
+    if text:
+        clauses.append("w.title LIKE ?")
+        params.append(f"%{text}%")
+
+    sql = ("SELECT w.* FROM work_items w "
+           "LEFT JOIN sync_state s ON s.organization = w.organization AND s.project = w.project")
+    sql += " WHERE " + " AND ".join(clauses)
+    sql += " ORDER BY w.changed_date DESC LIMIT ?"
+    params.append(int(top))
+
+    conn = _connect(db_path)
+    try:
+        rows = [dict(row) for row in conn.execute(sql, params).fetchall()]
+    finally:
+        conn.close()
+
+    freshness = format_freshness(project, db_path, organization_url) if project else None
+    return rows, freshness
+
+# Words a simple "my work items" question may contain besides the project, type, count
+# and state; any other word (sprint, priority, last week, tag, ...) is a qualifier the
+# index query cannot apply, so the agent answers instead
+_QUESTION_WORDS = set("""
+    a an the me my i i'm am are is what which show list give get display find see all any
+    please can you could tell that have has do does currently current assigned to in on of
+    for at azure devops ado project work items item tasks task bugs bug user story stories
+    features feature
+""".split())
+
+_STATE_WORDS = {
+    "open": None,
+    "active": "Active",
+    "new": "New",
+    "in-progress": "In Progress",
+    "closed": "Closed",
+    "done": "Done",
+    "resolved": "Resolved",
+    "removed": "Removed",
+    "completed": list(COMPLETED_STATES),
+    "finished": list(COMPLETED_STATES),
+}
+
+def _parse_index_question(user_message):
+    """Recognise simple "my work items in <project>" questions; returns filter kwargs or None"""
+    message = user_message.lower()
+    if not re.search(r"assigned to me|i am assigned|i'm assigned|\bmy (?:[\w-]+ )?(tasks|bugs|work items|items)\b", message):
+        return None
+    # Anything that changes data has to go through the agent
+    if re.search(r"\b(update|change|set|create|delete|close|comment|assign \w+ to)\b", message):
+        return None
+
+    project_match = re.search(r"\bin (?:the )?(\w[\w-]*) project\b", message) or re.search(r"\bproject (\w[\w-]*)\b", message)
+    if not project_match:
+        return None
+
+    top_match = re.search(r"\b(?:list|show|give)(?: me)? (\d+)\b", message)
+    words = re.findall(r"[\w'-]+", message.replace("in progress", "in-progress"))
+    states = [word for word in words if word in _STATE_WORDS]
+    unknown = [
+        word for word in words
+        if word not in _QUESTION_WORDS and word not in _STATE_WORDS and word != project_match.group(1)
+        and not (top_match and word == top_match.group(1))
+    ]
+    if unknown or len(set(states)) > 1:
+        return None
+
+    work_item_type = None
+    for candidate, type_name in (("user stor", "User Story"), ("bug", "Bug"), ("task", "Task"), ("feature", "Feature")):
+        if candidate in message:
+            work_item_type = type_name
+            break
+
+    return {
+        "project": project_match.group(1),
+        "assigned_to_me": True,
+        "work_item_type": work_item_type,
+        "state": _STATE_WORDS[states[0]] if states else None,
+        "top": int(top_match.group(1)) if top_match else 50
+    }
+
+def answer_from_index(user_message, db_path=None):
+    """Return a formatted answer for list questions the index can serve, otherwise None"""
+    try:
+        filters = _parse_index_question(user_message)
+        if not filters:
+            return None
+
+        project = filters["project"]
+        organization = get_org_registry().for_project(project)
+        # The team's area is synced along with the user's own items
+        area_paths = [organization.area_path] if organization.area_path else None
+        last_synced_at, age_seconds = get_index_freshness(project, db_path, organization.url)
+        if last_synced_at is None:
+            # First question for this project: let the agent answer and build the index meanwhile
+            sync_in_background(project, area_paths, organization.url, db_path)
+            return None
+        if age_seconds > STALE_AFTER_SECONDS:
+            sync_in_background(project, area_paths, organization.url, db_path)
+
+        rows, freshness = query_work_item_index(db_path=db_path, organization_url=organization.url, **filters)
+        result = f"[{freshness}]\n"
+        if not rows:
+            return result + "No matching work items found in the local index.\n"
+        for row in rows:
+            result += f"  #{row['id']} [{row['work_item_type']}] {row['title']} - {row['state']}"
+            if row['iteration_path']:
+                result += f" ({row['iteration_path']})"
+            result += "\n"
+        return result
+    except Exception as e:
+        print(f"Work item index lookup failed, falling back to agent: {e}")
+        return None
+
+if __name__ == "__main__":
+    import sys
+    project_name = sys.argv[1] if len(sys.argv) > 1 else "TaxProf"
+    organization_url = get_org_registry().for_project(project_name).url
+    count, message = sync_work_item_index(project_name, area_paths=sys.argv[2:], organization_url=organization_url)
+    print(f"Synced {count} work items for {project_name}: {message}")
+    print(format_freshness(project_name, organization_url=organization_url))
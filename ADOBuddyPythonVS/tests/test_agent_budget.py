@@ -0,0 +1,51 @@
+import asyncio
+import types
+import pytest
+from AgentBudget import QUERY_BUDGETS, BudgetTracker, classify_query, get_budget, install_tool_budget
+
+@pytest.mark.parametrize("message, expected", [
+    ("Show my active bugs in TaxProf", "lookup"),
+    ("List the builds of the TaxProf project", "lookup"),
+    ("Set the state of #4127687 to Active", "update"),
+    ("Assign 4127687 to Sample User", "update"),
+    ("Summarize the latest builds across TaxProf", "analysis"),
+    ("Why did the nightly build fail?", "analysis"),
+    ("Compare this sprint with the last one and update the report", "analysis"),
+    ("show " + "x " * 200, "analysis"),
+])
+def test_classify_query(message, expected):
+    assert classify_query(message) == expected
+
+def test_get_budget_applies_valid_overrides_and_ignores_bad_ones(monkeypatch):
+    monkeypatch.setenv("ADOBUDDY_BUDGET_LOOKUP", "wall_seconds=30, tool_calls=4, max_steps=-1, unknown=3, llm_tokens=lots")
+    budget = get_budget("lookup")
+    assert budget["wall_seconds"] == 30
+    assert budget["tool_calls"] == 4
+    assert budget["max_steps"] == QUERY_BUDGETS["lookup"]["max_steps"]
+    assert budget["llm_tokens"] == QUERY_BUDGETS["lookup"]["llm_tokens"]
+    assert "unknown" not in budget
+    # Overrides never leak into the defaults
+    assert QUERY_BUDGETS["lookup"]["wall_seconds"] == 45
+
+def test_tool_budget_stops_the_run_once_spent(monkeypatch):
+    monkeypatch.delenv("ADOBUDDY_BUDGET_LOOKUP", raising=False)
+    tracker = BudgetTracker("List the builds", "lookup", dict(get_budget("lookup"), tool_calls=2))
+
+    async def call_tool(name, arguments):
+        return types.SimpleNamespace(content=[types.SimpleNamespace(text=f"{name} result")])
+
+    connector = types.SimpleNamespace(call_tool=call_tool)
+    install_tool_budget(connector, tracker)
+
+    async def run():
+        await connector.call_tool("build_get_builds", {})
+        await connector.call_tool("build_get_definitions", {})
+        await connector.call_tool("build_get_changes", {})
+
+    with pytest.raises(asyncio.CancelledError):
+        asyncio.run(run())
+    assert tracker.tool_calls == 3
+    assert tracker.exhausted == "tool call budget of 2 reached"
+    partial = tracker.partial_answer()
+    assert "build_get_builds: build_get_builds result" in partial
+    assert "build_get_changes" not in partial
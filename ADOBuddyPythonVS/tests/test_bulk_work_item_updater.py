@@ -0,0 +1,39 @@
+from BulkWorkItemUpdater import build_patch_operations, parse_bulk_command
+
+def test_parses_ids_fields_and_comment():
+    command = parse_bulk_command('bulk update TaxProf ids 101, 102,103 set System.State=Closed; System.Tags="a; b" '
+                                 'comment "Closed by the release script"')
+    assert command == {
+        "project": "TaxProf",
+        "ids": [101, 102, 103],
+        "wiql": None,
+        "field_updates": {"System.State": "Closed", "System.Tags": "a; b"},
+        "comment": "Closed by the release script",
+        "dry_run": False,
+    }
+
+def test_parses_wiql_and_trailing_dry_run():
+    command = parse_bulk_command("bulk update in TaxProf wiql \"SELECT [System.Id] FROM WorkItems WHERE [System.State] = 'New'\" "
+                                 "set System.State=Active dry-run")
+    assert command["project"] == "TaxProf"
+    assert command["ids"] is None
+    assert command["wiql"] == "SELECT [System.Id] FROM WorkItems WHERE [System.State] = 'New'"
+    assert command["field_updates"] == {"System.State": "Active"}
+    assert command["dry_run"] is True
+
+def test_dry_run_inside_text_is_not_a_flag():
+    command = parse_bulk_command('bulk update TaxProf ids 7 comment "prepare the dry run" set System.Title="Plan dry run"')
+    assert command["dry_run"] is False
+    assert command["comment"] == "prepare the dry run"
+    assert command["field_updates"] == {"System.Title": "Plan dry run"}
+
+def test_other_messages_are_not_bulk_commands():
+    assert parse_bulk_command("update work item 7 in TaxProf") is None
+    assert parse_bulk_command("please bulk update TaxProf ids 1") is None
+
+def test_build_patch_operations_adds_comment_as_history():
+    assert build_patch_operations({"System.State": "Closed"}, "done") == [
+        {"op": "add", "path": "/fields/System.State", "value": "Closed"},
+        {"op": "add", "path": "/fields/System.History", "value": "done"},
+    ]
+    assert build_patch_operations() == []
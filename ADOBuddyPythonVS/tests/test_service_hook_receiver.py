@@ -0,0 +1,80 @@
+import os
+import json
+import pytest
+import requests
+import AdoMetadataCache
+import ToolResultShaper
+import WorkItemIndex
+import ServiceHookReceiver
+from OrgRegistry import OrgRegistry, AdoOrganization, get_org_registry, set_org_registry
+
+def _sample(name):
+    with open(os.path.join(ServiceHookReceiver.SAMPLES_DIR, f"{name}.json"), 'r', encoding='utf-8') as file:
+        return json.load(file)
+
+@pytest.fixture(autouse=True)
+def isolated_caches(tmp_path, monkeypatch):
+    monkeypatch.setattr(WorkItemIndex, "INDEX_DB_PATH", str(tmp_path / "index.db"))
+    monkeypatch.setattr(AdoMetadataCache, "METADATA_CACHE_PATH", str(tmp_path / "metadata.json"))
+    monkeypatch.setattr(ToolResultShaper, "_results", type(ToolResultShaper._results)())
+    monkeypatch.setattr(ToolResultShaper, "_results_chars", 0)
+    registry = get_org_registry()
+    set_org_registry(OrgRegistry([
+        AdoOrganization("tr-tax", "https://dev.azure.com/tr-tax", ["TaxProf"]),
+        AdoOrganization("other", "https://dev.azure.com/other", ["TaxProf"]),
+    ]))
+    yield
+    set_org_registry(registry)
+
+def _cache_result(ref, tool_name, scope, arguments):
+    ToolResultShaper._store_result(ref, tool_name, "x" * 10, scope, arguments)
+
+def test_work_item_event_drops_only_results_that_may_cover_the_item():
+    _cache_result("mine", "wit_my_work_items", "tr-tax", {"project": "TaxProf"})
+    _cache_result("same item", "wit_get_work_item", "tr-tax", {"project": "TaxProf", "id": 4127687})
+    _cache_result("other item", "wit_get_work_item", "tr-tax", {"project": "TaxProf", "id": 7})
+    _cache_result("other project", "wit_my_work_items", "tr-tax", {"project": "Elsewhere"})
+    _cache_result("other org", "wit_my_work_items", "other", {"project": "TaxProf"})
+    _cache_result("builds", "build_get_builds", "tr-tax", {"project": "TaxProf"})
+
+    actions = ServiceHookReceiver.handle_event(_sample("workitem.updated"))
+
+    assert actions == ["2 cached tool result(s) dropped"]
+    assert sorted(ToolResultShaper._results) == ["builds", "other item", "other org", "other project"]
+
+def test_build_event_is_scoped_to_its_organization_and_project():
+    _cache_result("builds", "build_get_builds", "tr-tax", {"project": "TaxProf"})
+    _cache_result("other org", "build_get_builds", "other", {"project": "TaxProf"})
+
+    assert ServiceHookReceiver.handle_event(_sample("build.complete")) == ["1 cached tool result(s) dropped"]
+    assert list(ToolResultShaper._results) == ["other org"]
+
+def test_work_item_event_patches_the_index_for_the_indexed_user():
+    conn = WorkItemIndex._connect()
+    with conn:
+        conn.execute("INSERT INTO sync_state VALUES (?, ?, ?, ?, ?)",
+                     ("https://dev.azure.com/tr-tax", "TaxProf", "sample.user@example.com", None, 0))
+    conn.close()
+    event = _sample("workitem.created")
+    event["resource"]["fields"]["System.AssignedTo"] = "Sample User <sample.user@example.com>"
+
+    assert ServiceHookReceiver.handle_event(event) == ["index patched for #4127687"]
+    rows, _ = WorkItemIndex.query_work_item_index("TaxProf", organization_url="https://dev.azure.com/tr-tax")
+    assert [(row["id"], row["assigned_to"]) for row in rows] == [(4127687, "Sample User")]
+    assert ServiceHookReceiver.handle_event(_sample("workitem.deleted"))[0] == "index patched for #4127687"
+
+def test_metadata_event_invalidates_the_project_metadata():
+    assert ServiceHookReceiver.handle_event(_sample("adobuddy.metadata.changed")) == ["metadata invalidated for TaxProf"]
+
+def test_receiver_requires_the_secret():
+    server = ServiceHookReceiver.start_service_hook_receiver("127.0.0.1", 0, secret="s3cret")
+    url = f"http://127.0.0.1:{server.server_address[1]}{ServiceHookReceiver.HOOK_PATH}"
+    try:
+        assert requests.post(url, json=_sample("git.pullrequest.merged"), timeout=10).status_code == 401
+        response = requests.post(url, json=_sample("git.pullrequest.merged"), auth=("any", "s3cret"), timeout=10)
+        assert response.status_code == 200
+        assert response.json()["eventType"] == "git.pullrequest.merged"
+        assert requests.post(url, data=b"{not json", headers={"X-ADOBuddy-Secret": "s3cret"}, timeout=10).status_code == 400
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,70 @@
+import asyncio
+import types
+import pytest
+from mcp.types import Tool
+from ToolArgumentValidator import ToolArgumentError, compile_tool_validators, install_argument_validation
+
+UPDATE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "id": {"type": "integer"},
+        "updates": {"type": "array", "items": {"type": "object", "properties": {
+            "op": {"type": "string", "enum": ["add", "replace", "remove"]},
+            "path": {"type": "string"},
+            "value": {"type": "string"},
+        }}},
+    },
+    "required": ["id", "updates"],
+}
+
+LIST_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "project": {"type": "string"},
+        "ids": {"type": "array", "items": {"type": "integer"}},
+        "includeClosed": {"anyOf": [{"type": "boolean"}, {"type": "null"}]},
+        "top": {"type": "integer"},
+    },
+    "required": ["project"],
+}
+
+def _validate(tool_name, schema, arguments):
+    return compile_tool_validators([Tool(name=tool_name, inputSchema=schema)])[tool_name](arguments)
+
+def test_repairs_common_model_mistakes():
+    normalized, fixes, errors = _validate("wit_update_work_item", UPDATE_SCHEMA, {
+        "id": "#4127687",
+        "updates": {"op": "Replace", "path": "System.State", "value": "Active"},
+    })
+    assert errors == []
+    assert normalized == {"id": 4127687, "updates": [
+        {"op": "replace", "path": "/fields/System.State", "value": "Active"}]}
+    assert len(fixes) == 4
+
+def test_splits_lists_and_drops_null_optionals():
+    normalized, fixes, errors = _validate("wit_get_work_items_batch_by_ids", LIST_SCHEMA, {
+        "project": "TaxProf", "ids": "1, 2,3", "includeClosed": None, "top": "10",
+    })
+    assert errors == []
+    assert normalized == {"project": "TaxProf", "ids": [1, 2, 3], "top": 10}
+
+def test_reports_what_cannot_be_repaired():
+    normalized, fixes, errors = _validate("wit_get_work_items_batch_by_ids", LIST_SCHEMA, {"top": "ten"})
+    assert any("project: required argument is missing" in error for error in errors)
+    assert any("top: expected a number" in error for error in errors)
+
+def test_installed_validation_rejects_before_calling_the_server():
+    calls = []
+
+    async def call_tool(name, arguments):
+        calls.append((name, arguments))
+        return "ok"
+
+    connector = types.SimpleNamespace(tools=[Tool(name="wit_list", inputSchema=LIST_SCHEMA)], call_tool=call_tool)
+    stats = install_argument_validation(connector)
+
+    assert asyncio.run(connector.call_tool("wit_list", {"project": "TaxProf", "top": "5"})) == "ok"
+    with pytest.raises(ToolArgumentError):
+        asyncio.run(connector.call_tool("wit_list", {"top": 5}))
+    assert calls == [("wit_list", {"project": "TaxProf", "top": 5})]
+    assert stats == {"calls": 2, "auto_fixed": 1, "rejected": 1, "retries_saved": 1}
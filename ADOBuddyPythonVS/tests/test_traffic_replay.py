@@ -0,0 +1,39 @@
+import asyncio
+import pytest
+
+SoakTest = pytest.importorskip("SoakTest")
+
+QUERY = "List the builds of the TaxProf project"
+
+async def _run_query(app):
+    chunks = []
+    async for chunk in app.process_query(QUERY):
+        chunks.append(chunk)
+    return "".join(chunks)
+
+def _answer(output):
+    return output.split("[Step 4/4] Returning output...\n", 1)[1]
+
+def test_replay_round_trip_runs_the_agent_offline(tmp_path, monkeypatch):
+    llm_server = SoakTest.start_stand_in_llm()
+    SoakTest.configure_environment(llm_server)
+    monkeypatch.setenv("ADOBUDDY_TRAFFIC_LOG", str(tmp_path / "traffic.jsonl"))
+    import ADOBuddyPythonVS as app
+    SoakTest.configure_app(app)
+
+    try:
+        monkeypatch.setenv("ADOBUDDY_TRAFFIC_MODE", "record")
+        recorded = asyncio.run(_run_query(app))
+    finally:
+        llm_server.shutdown()
+    assert "Error" not in recorded
+    assert "1 tool call(s)" in recorded
+    assert "[traffic] recorded to" in recorded
+
+    # Neither the LLM stand-in nor an MCP server is running any more
+    monkeypatch.setenv("ADOBUDDY_TRAFFIC_MODE", "replay")
+    replayed = asyncio.run(_run_query(app))
+    assert "Error" not in replayed
+    assert "1 tool call(s)" in replayed
+    assert ", 0 missed" in replayed
+    assert _answer(replayed) == _answer(recorded)
@@ -0,0 +1,114 @@
+import re
+import types
+import pytest
+import WorkItemIndex
+
+ORG_URL = "https://dev.azure.com/stand-in"
+
+def _work_item(work_item_id, changed_date, assigned_to="Sample User <sample.user@example.com>", project="TaxProf"):
+    return {"id": work_item_id, "fields": {
+        "System.TeamProject": project, "System.WorkItemType": "Task", "System.Title": f"Task {work_item_id}",
+        "System.State": "Active", "System.AssignedTo": assigned_to, "System.ChangedDate": changed_date,
+    }}
+
+class FakeAdo:
+    """Answers the WIQL and workitemsbatch requests of a sync from an in-memory item list"""
+
+    def __init__(self, work_items):
+        self.work_items = {item["id"]: item for item in work_items}
+        self.in_scope = set(self.work_items)
+        self.queries = []
+
+    def post(self, url, json=None, headers=None):
+        if "/wiql" in url:
+            self.queries.append(json["query"])
+            if "[System.Id] IN (" in json["query"]:
+                # Changed-since check of indexed items: every known item counts as changed
+                listed = re.search(r"IN \(([^)]*)\)", json["query"]).group(1)
+                found = [int(work_item_id) for work_item_id in listed.split(",") if int(work_item_id) in self.work_items]
+            else:
+                found = sorted(self.in_scope)
+            body = {"workItems": [{"id": work_item_id} for work_item_id in found]}
+        else:
+            body = {"value": [self.work_items[work_item_id] for work_item_id in json["ids"]]}
+        return types.SimpleNamespace(status_code=200, text="", json=lambda: body, raise_for_status=lambda: None)
+
+@pytest.fixture
+def ado(monkeypatch):
+    fake = FakeAdo([_work_item(1, "2025-06-02T09:15:00Z"), _work_item(2, "2025-06-02T09:15:00.5Z")])
+    monkeypatch.setattr(WorkItemIndex, "get_ado_auth_token", lambda url: ("token", True, "ok"))
+    monkeypatch.setattr(WorkItemIndex, "get_http_session", lambda url: fake)
+    monkeypatch.setattr(WorkItemIndex, "_get_authenticated_user", lambda url, headers: "sample.user@example.com")
+    return fake
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "index.db")
+
+def _sync_state(db_path):
+    conn = WorkItemIndex._connect(db_path)
+    try:
+        return dict(conn.execute("SELECT * FROM sync_state").fetchone())
+    finally:
+        conn.close()
+
+def test_changed_dates_compare_as_times_not_text():
+    # As text "...00Z" sorts after "...00.5Z" although it is half a second earlier
+    assert WorkItemIndex._parse_changed_date("2025-06-02T09:15:00Z") < WorkItemIndex._parse_changed_date("2025-06-02T09:15:00.5Z")
+    assert WorkItemIndex._normalize_changed_date("2025-06-02T11:15:00.1234567+02:00") == "2025-06-02T09:15:00.123Z"
+    assert WorkItemIndex._normalize_changed_date("not a date") == "not a date"
+
+def test_sync_stores_the_latest_change_as_normalized_watermark(ado, db_path):
+    synced, message = WorkItemIndex.sync_work_item_index("TaxProf", organization_url=ORG_URL, db_path=db_path)
+    assert (synced, message) == (2, "Success")
+    state = _sync_state(db_path)
+    assert state["watermark"] == "2025-06-02T09:15:00.500Z"
+    assert state["user_unique_name"] == "sample.user@example.com"
+    assert "[System.ChangedDate] >= '" not in ado.queries[0]
+
+    rows, _ = WorkItemIndex.query_work_item_index("TaxProf", assigned_to_me=True, db_path=db_path, organization_url=ORG_URL)
+    assert [row["id"] for row in rows] == [2, 1]
+    assert rows[0]["assigned_to"] == "Sample User"
+    assert rows[0]["assigned_to_unique"] == "sample.user@example.com"
+
+def test_incremental_sync_uses_the_watermark_and_drops_items_that_left_scope(ado, db_path):
+    WorkItemIndex.sync_work_item_index("TaxProf", organization_url=ORG_URL, db_path=db_path)
+    ado.in_scope = {2}
+
+    assert WorkItemIndex.sync_work_item_index("TaxProf", organization_url=ORG_URL, db_path=db_path) == (1, "Success")
+    assert "[System.ChangedDate] >= '2025-06-02T09:15:00.500Z'" in ado.queries[1]
+    rows, _ = WorkItemIndex.query_work_item_index("TaxProf", db_path=db_path, organization_url=ORG_URL)
+    assert [row["id"] for row in rows] == [2]
+    assert _sync_state(db_path)["watermark"] == "2025-06-02T09:15:00.500Z"
+
+def test_work_item_events_patch_the_index_in_order(ado, db_path):
+    WorkItemIndex.sync_work_item_index("TaxProf", organization_url=ORG_URL, db_path=db_path)
+
+    # A revision delivered late must not overwrite the newer indexed one
+    late = _work_item(2, "2025-06-02T11:15:00.4+02:00")
+    assert not WorkItemIndex.apply_work_item_event(late, db_path=db_path, organization_url=ORG_URL)
+    # New items are only added when assigned to the indexed user
+    assert WorkItemIndex.apply_work_item_event(_work_item(3, "2025-06-03T08:00:00Z"), db_path=db_path, organization_url=ORG_URL)
+    assert not WorkItemIndex.apply_work_item_event(_work_item(4, "2025-06-03T08:00:00Z", "Someone Else <someone@example.com>"),
+                                                   db_path=db_path, organization_url=ORG_URL)
+    assert WorkItemIndex.apply_work_item_event({"id": 1}, deleted=True, db_path=db_path, organization_url=ORG_URL)
+
+    rows, _ = WorkItemIndex.query_work_item_index("TaxProf", db_path=db_path, organization_url=ORG_URL)
+    assert [row["id"] for row in rows] == [3, 2]
+    # Rows of one organization are invisible to another
+    rows, _ = WorkItemIndex.query_work_item_index("TaxProf", db_path=db_path, organization_url="https://dev.azure.com/other")
+    assert rows == []
+
+@pytest.mark.parametrize("message, expected", [
+    ("Show my active bugs in the TaxProf project", {"work_item_type": "Bug", "state": "Active", "top": 50}),
+    ("list 5 work items assigned to me in TaxProf project", {"work_item_type": None, "state": None, "top": 5}),
+    ("my tasks in the TaxProf project from last sprint", None),
+    ("close my tasks in the TaxProf project", None),
+    ("show my tasks", None),
+])
+def test_parse_index_question(message, expected):
+    filters = WorkItemIndex._parse_index_question(message)
+    if expected is None:
+        assert filters is None
+    else:
+        assert filters == dict(expected, project="taxprof", assigned_to_me=True)